@@ -8,6 +8,9 @@ used to parse email addresses and urls.
 
 To override the default DNS lookup library or MX Cache, use the
 set_dns_lookup and set_mx_cache methods. For more details, see the User Manual.
+
+To cache the results of parsing recurring addresses in memory, use the
+set_parse_cache method.
 """
 
 
@@ -19,3 +22,21 @@ def set_dns_lookup(dns_lookup):
 def set_mx_cache(mx_cache):
     from flanker.addresslib import validate
     validate._mx_cache = mx_cache
+
+
+def set_parse_cache(maxsize):
+    """
+    Enables caching of up to `maxsize` most recently used results of
+    `address.parse` and `address.parse_list`, or disables the cache if
+    `maxsize` is None or 0. Cache hits and misses are reported as
+    address.parse_cache.hit and address.parse_cache.miss metrics.
+    """
+    from flanker.addresslib import address
+    from flanker.addresslib.lru import LRUCache
+    address._parse_cache = LRUCache(maxsize) if maxsize else None
+
+
+def clear_parse_cache():
+    from flanker.addresslib import address
+    if address._parse_cache is not None:
+        address._parse_cache.clear()
@@ -28,14 +28,22 @@ Public Functions in flanker.addresslib.address module:
       Validates an address list, and returns a tuple of parsed and unparsed
       portions.
 
+    * validate_batch(addr_specs, concurrency=10)
+
+      Validates many addr-specs looking up the mail exchanger of each
+      distinct domain once, concurrently for different domains.
+
 When valid addresses are returned, they are returned as an instance of either
 EmailAddress or UrlAddress in flanker.addresslib.address.
 
 See the parser.py module for implementation details of the parser.
 """
+import copy
 from logging import getLogger
+from multiprocessing.pool import ThreadPool
 
 import idna
+import regex as re
 import six
 from idna import IDNAError
 from ply.lex import LexError
@@ -44,7 +52,7 @@ from six.moves.urllib_parse import urlparse
 from time import time
 from tld import get_tld
 
-from flanker import _email
+from flanker import _email, metrics as flanker_metrics
 from flanker.addresslib._parser.lexer import lexer
 from flanker.addresslib._parser.parser import (Mailbox, Url, mailbox_parser,
                                                mailbox_or_url_parser,
@@ -62,6 +70,27 @@ MAX_ADDRESS_LENGTH = 1024
 MAX_ADDRESS_NUMBER = 1024
 MAX_ADDRESS_LIST_LENGTH = MAX_ADDRESS_LENGTH * MAX_ADDRESS_NUMBER
 
+# The most common address shapes, `local@domain` and `Name <local@domain>`,
+# made of plain ASCII atoms only are recognized with a regular expression
+# before resorting to the parser. Everything else, e.g. quoted strings,
+# comments, domain literals or non-ASCII characters, is left to the parser.
+_ATEXT = r"[a-zA-Z0-9!#$%&'*+\-/=?^_`{|}~]"
+_DOT_ATOM = r'{atext}+(?:\.{atext}+)*'.format(atext=_ATEXT)
+_ADDR_SPEC = r'(?P<local_part>{dot_atom})@(?P<domain>{dot_atom})'.format(
+    dot_atom=_DOT_ATOM)
+# A phrase word is a sequence of atoms and dots in any order, words are
+# joined with a single space by the parser.
+_WORD = r"[a-zA-Z0-9!#$%&'*+\-/=?^_`{|}~.]+"
+
+_RE_SIMPLE_ADDR_SPEC = re.compile(_ADDR_SPEC + r'\Z')
+# Parse results cache, see `flanker.addresslib.set_parse_cache`.
+_parse_cache = None
+_MISSING = object()
+
+_RE_SIMPLE_MAILBOX = re.compile(
+    r'(?:(?P<display_name>{word}(?:[ \t]+{word})*)[ \t]*)?<{addr_spec}>\Z'
+    .format(word=_WORD, addr_spec=_ADDR_SPEC))
+
 
 @metrics_wrapper()
 def parse(address, addr_spec_only=False, strict=False, metrics=False):
@@ -108,8 +137,14 @@ def parse(address, addr_spec_only=False, strict=False, metrics=False):
         return None, mtimes
 
     bstart = time()
+    cache_key = ('parse', address, addr_spec_only, strict)
+    addr_obj = _get_cached(cache_key)
+    if addr_obj is not _MISSING:
+        mtimes['parsing'] = time() - bstart
+        return addr_obj, mtimes
+
     try:
-        parse_rs = parser.parse(address.strip(), lexer=lexer.clone())
+        parse_rs = _parse(parser, address.strip(), addr_spec_only)
         addr_obj = _lift_parse_result(parse_rs)
     except (LexError, YaccError, SyntaxError):
         addr_obj = None
@@ -119,7 +154,7 @@ def parse(address, addr_spec_only=False, strict=False, metrics=False):
         addr_spec = addr_parts[-1]
         if len(addr_spec) < len(address):
             try:
-                parse_rs = parser.parse(addr_spec, lexer=lexer.clone())
+                parse_rs = _parse(parser, addr_spec, addr_spec_only)
                 addr_obj = _lift_parse_result(parse_rs)
                 if addr_obj:
                     display_name = ' '.join(addr_parts[:-1])
@@ -130,6 +165,7 @@ def parse(address, addr_spec_only=False, strict=False, metrics=False):
             except (LexError, YaccError, SyntaxError):
                 addr_obj = None
 
+    _put_cached(cache_key, addr_obj)
     mtimes['parsing'] = time() - bstart
     return addr_obj, mtimes
 
@@ -170,6 +206,14 @@ def parse_discrete_list(address_list, as_tuple=False, metrics=False):
         return _parse_list_result(as_tuple, AddressList(), [address_list], mtimes)
 
     bstart = time()
+    cache_key = ('parse_list', address_list_s)
+    cached = _get_cached(cache_key)
+    if cached is not _MISSING:
+        addr_list_obj, bad_addr_list = cached
+        mtimes['parsing'] = time() - bstart
+        return _parse_list_result(as_tuple, addr_list_obj, bad_addr_list,
+                                  mtimes)
+
     try:
         parse_list_rs = mailbox_or_url_list_parser.parse(address_list_s.strip(),
                                                          lexer.clone())
@@ -177,6 +221,7 @@ def parse_discrete_list(address_list, as_tuple=False, metrics=False):
         if len(addr_list_obj) == 0:
             bad_addr_list.append(address_list_s)
 
+        _put_cached(cache_key, (addr_list_obj, bad_addr_list))
         mtimes['parsing'] = time() - bstart
     except (LexError, YaccError, SyntaxError):
         return _parse_list_result(as_tuple, AddressList(), [address_list], mtimes)
@@ -276,56 +321,63 @@ def validate_address(addr_spec, metrics=False, skip_remote_checks=False):
         >>> address.validate_address('user.1234@gmail.com')
         user.1234@gmail.com
     """
-    mtimes = {'parsing': 0,
-              'tld_lookup': 0,
-              'mx_lookup': 0,
-              'dns_lookup': 0,
-              'mx_conn':0 ,
-              'custom_grammar':0}
+    mtimes = _validation_mtimes()
 
-    # sanity check
-    if addr_spec is None:
-        return None, mtimes
-    if '@' not in addr_spec:
-        return None, mtimes
+    paddr = _validate_syntax(addr_spec, mtimes)
+    if paddr is None or skip_remote_checks:
+        return paddr, mtimes
 
-    # run parser against address
-    bstart = time()
-    paddr = parse(addr_spec, addr_spec_only=True, strict=True)
-    mtimes['parsing'] = time() - bstart
-    if paddr is None:
-        _log.debug('failed parse check for %s', addr_spec)
-        return None, mtimes
+    # lookup if this domain has a mail exchanger
+    exchanger, mx_metrics = mail_exchanger_lookup(paddr.hostname, metrics=True)
+    _add_mtimes(mtimes, mx_metrics)
+    return _validate_exchanger(paddr, exchanger, mtimes), mtimes
 
-    # lookup the TLD
-    bstart = time()
-    tld = get_tld(paddr.hostname, fail_silently=True, fix_protocol=True)
-    mtimes['tld_lookup'] = time() - bstart
-    if tld is None:
-        _log.debug('failed tld check for %s', addr_spec)
-        return None, mtimes
 
+@metrics_wrapper()
+def validate_batch(addr_specs, concurrency=10, metrics=False,
+                   skip_remote_checks=False):
+    """
+    Validates addr-specs the way validate_address does it, but looks up the
+    mail exchanger of each distinct domain only once, and for different
+    domains concurrently on a pool of `concurrency` threads.
+
+    Returns a list with an EmailAddress object or None for every given
+    addr-spec, in the same order. If requested, will also return the
+    processing time metrics summed up over all addresses and domains.
+
+    Examples:
+        >>> address.validate_batch(['a@mailgun.com', 'b@mailgun.com', 'c@d'])
+        [a@mailgun.com, b@mailgun.com, None]
+    """
+    mtimes = _validation_mtimes()
+    paddrs = [_validate_syntax(addr_spec, mtimes) for addr_spec in addr_specs]
     if skip_remote_checks:
-        return paddr, mtimes
+        return paddrs, mtimes
 
-    # lookup if this domain has a mail exchanger
-    exchanger, mx_metrics = mail_exchanger_lookup(paddr.hostname, metrics=True)
-    mtimes['mx_lookup'] = mx_metrics['mx_lookup']
-    mtimes['dns_lookup'] = mx_metrics['dns_lookup']
-    mtimes['mx_conn'] = mx_metrics['mx_conn']
-    if exchanger is None:
-        _log.debug('failed mx check for %s', addr_spec)
-        return None, mtimes
+    domains = list(set(paddr.hostname for paddr in paddrs if paddr))
+    exchangers = {}
+    if domains:
+        pool = ThreadPool(min(concurrency, len(domains)))
+        try:
+            lookups = pool.map(
+                lambda domain: mail_exchanger_lookup(domain, metrics=True),
+                domains)
+        finally:
+            pool.close()
+            pool.join()
 
-    # lookup custom local-part grammar if it exists
-    bstart = time()
-    plugin = plugin_for_esp(exchanger)
-    mtimes['custom_grammar'] = time() - bstart
-    if plugin and plugin.validate(paddr) is False:
-        _log.debug('failed custom grammer check for %s/%s', addr_spec, plugin.__name__)
-        return None, mtimes
+        for domain, (exchanger, mx_metrics) in zip(domains, lookups):
+            exchangers[domain] = exchanger
+            _add_mtimes(mtimes, mx_metrics)
+
+    results = []
+    for paddr in paddrs:
+        if paddr is not None:
+            paddr = _validate_exchanger(paddr, exchangers[paddr.hostname],
+                                        mtimes)
+        results.append(paddr)
 
-    return paddr, mtimes
+    return results, mtimes
 
 
 @metrics_wrapper()
@@ -836,6 +888,138 @@ class AddressList(object):
         return set([addr.addr_type for addr in self._container])
 
 
+def _validation_mtimes():
+    return {'parsing': 0,
+            'tld_lookup': 0,
+            'mx_lookup': 0,
+            'dns_lookup': 0,
+            'mx_conn': 0,
+            'custom_grammar': 0}
+
+
+def _add_mtimes(mtimes, more_mtimes):
+    for k, v in more_mtimes.items():
+        mtimes[k] += v
+
+
+def _validate_syntax(addr_spec, mtimes):
+    """
+    Parses an addr-spec and checks its TLD. Returns an EmailAddress object
+    or None.
+    """
+    # sanity check
+    if addr_spec is None:
+        return None
+    if '@' not in addr_spec:
+        return None
+
+    # run parser against address
+    bstart = time()
+    paddr = parse(addr_spec, addr_spec_only=True, strict=True)
+    mtimes['parsing'] += time() - bstart
+    if paddr is None:
+        _log.debug('failed parse check for %s', addr_spec)
+        return None
+
+    # lookup the TLD
+    bstart = time()
+    tld = get_tld(paddr.hostname, fail_silently=True, fix_protocol=True)
+    mtimes['tld_lookup'] += time() - bstart
+    if tld is None:
+        _log.debug('failed tld check for %s', addr_spec)
+        return None
+
+    return paddr
+
+
+def _validate_exchanger(paddr, exchanger, mtimes):
+    """
+    Checks a parsed address against the mail exchanger found for its domain
+    and the custom local-part grammar of the exchanger if it exists. Returns
+    the address if it is valid, or None.
+    """
+    if exchanger is None:
+        _log.debug('failed mx check for %s', paddr.address)
+        return None
+
+    # lookup custom local-part grammar if it exists
+    bstart = time()
+    plugin = plugin_for_esp(exchanger)
+    mtimes['custom_grammar'] += time() - bstart
+    if plugin and plugin.validate(paddr) is False:
+        _log.debug('failed custom grammer check for %s/%s', paddr.address,
+                   plugin.__name__)
+        return None
+
+    return paddr
+
+
+def _get_cached(key):
+    """
+    Returns a copy of a cached parse result, or _MISSING if there is none.
+    """
+    cache = _parse_cache
+    if cache is None:
+        return _MISSING
+
+    result = cache.get(key, _MISSING)
+    if result is _MISSING:
+        flanker_metrics.incr('address.parse_cache.miss')
+        return _MISSING
+
+    flanker_metrics.incr('address.parse_cache.hit')
+    return _copy_result(result)
+
+
+def _put_cached(key, result):
+    cache = _parse_cache
+    if cache is not None:
+        cache[key] = _copy_result(result)
+
+
+def _copy_result(result):
+    """
+    Parse results are mutable, so the cache keeps its own copies of them and
+    hands out copies as well.
+    """
+    if isinstance(result, tuple):
+        addr_list_obj, bad_addr_list = result
+        return (AddressList([copy.copy(a) for a in addr_list_obj]),
+                list(bad_addr_list))
+
+    return copy.copy(result)
+
+
+def _parse(parser, address, addr_spec_only):
+    parse_rs = _parse_simple(address, addr_spec_only)
+    if parse_rs is None:
+        parse_rs = parser.parse(address, lexer=lexer.clone())
+
+    return parse_rs
+
+
+def _parse_simple(address, addr_spec_only=False):
+    """
+    Parses an address of a simple shape without the parser. Returns the same
+    result the parser would, or None if the address shape is not simple.
+    """
+    match = _RE_SIMPLE_ADDR_SPEC.match(address)
+    if match:
+        return Mailbox('', match.group('local_part'),
+                       match.group('domain'))
+
+    if addr_spec_only:
+        return None
+
+    match = _RE_SIMPLE_MAILBOX.match(address)
+    if match:
+        display_name = match.group('display_name') or ''
+        return Mailbox(' '.join(display_name.split()),
+                       match.group('local_part'), match.group('domain'))
+
+    return None
+
+
 def _lift_parse_result(parse_rs):
     if isinstance(parse_rs, Mailbox):
         try:
@@ -0,0 +1,296 @@
+# coding:utf-8
+
+"""
+Asyncio counterparts of the address validation functions, Python 3 only.
+
+Public Functions in flanker.addresslib.aio module:
+
+    * validate_address_async(addr_spec, metrics=False,
+                             skip_remote_checks=False)
+
+      Same as address.validate_address, but the MX lookup, the MX cache and
+      probing of mail exchangers do not block the event loop.
+
+    * validate_list_async(addr_list, as_tuple=False, metrics=False,
+                          skip_remote_checks=False)
+
+      Same as address.validate_list, addresses are validated concurrently and
+      every distinct domain is looked up only once.
+
+    * mail_exchanger_lookup_async(domain, metrics=False)
+
+      Looks up the mail exchanger for a given domain.
+
+    * connect_to_mail_exchanger_async(mx_hosts)
+
+      Attempts to connect to mail exchangers to see if any of them exists.
+
+DNS lookups and the MX cache go through asynchronous drivers:
+
+    * DNS lookup driver is an object with a coroutine method `lookup(fqdn)`
+      that returns a list of MX hosts for a fully qualified domain name.
+
+    * MX cache is an object with coroutine methods `get(domain)`, that
+      returns a cached mail exchanger or None, and `set(domain, value)`.
+
+By default the synchronous drivers of the validate module are run in the
+default executor of the event loop, use set_async_dns_lookup and
+set_async_mx_cache to provide native asynchronous ones.
+"""
+import asyncio
+from logging import getLogger
+from time import time
+
+from flanker.addresslib import address, validate
+
+log = getLogger(__name__)
+
+# Delay before connecting to the next mail exchanger while connecting to the
+# previous ones is still in progress.
+MX_CONN_DELAY = 0.25
+MX_CONN_TIMEOUT = 1.0
+
+_async_mx_cache = None
+_async_dns_lookup = None
+
+
+def set_async_dns_lookup(dns_lookup):
+    global _async_dns_lookup
+    _async_dns_lookup = dns_lookup
+
+
+def set_async_mx_cache(mx_cache):
+    global _async_mx_cache
+    _async_mx_cache = mx_cache
+
+
+class ExecutorDNSLookup(object):
+    """
+    Asynchronous DNS lookup driver that runs a synchronous one, the one
+    configured in the validate module by default, in an executor.
+    """
+
+    def __init__(self, dns_lookup=None, executor=None):
+        self._dns_lookup = dns_lookup
+        self._executor = executor
+
+    async def lookup(self, fqdn):
+        dns_lookup = self._dns_lookup or validate._get_dns_lookup()
+        loop = asyncio.get_event_loop()
+        mx_hosts = await loop.run_in_executor(
+            self._executor, dns_lookup.__getitem__, fqdn)
+        return list(mx_hosts)
+
+
+class ExecutorMxCache(object):
+    """
+    Asynchronous MX cache that runs a synchronous one, the one configured in
+    the validate module by default, in an executor.
+    """
+
+    def __init__(self, mx_cache=None, executor=None):
+        self._mx_cache = mx_cache
+        self._executor = executor
+
+    async def get(self, domain):
+        mx_cache = self._mx_cache or validate._get_mx_cache()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, mx_cache.__getitem__, domain)
+
+    async def set(self, domain, value):
+        mx_cache = self._mx_cache or validate._get_mx_cache()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            self._executor, mx_cache.__setitem__, domain, value)
+
+
+async def validate_address_async(addr_spec, metrics=False,
+                                 skip_remote_checks=False):
+    """
+    Given an addr-spec, runs the same checks as address.validate_address
+    without blocking the event loop.
+
+    In the case of a valid address returns an EmailAddress object, otherwise
+    returns None. If requested, will also return the parsing time metrics.
+    """
+    mtimes = address._validation_mtimes()
+
+    paddr = address._validate_syntax(addr_spec, mtimes)
+    if paddr is not None and not skip_remote_checks:
+        exchanger, mx_metrics = await mail_exchanger_lookup_async(
+            paddr.hostname, metrics=True)
+        address._add_mtimes(mtimes, mx_metrics)
+        paddr = address._validate_exchanger(paddr, exchanger, mtimes)
+
+    if metrics:
+        return paddr, mtimes
+    return paddr
+
+
+async def validate_list_async(addr_list, as_tuple=False, metrics=False,
+                              skip_remote_checks=False):
+    """
+    Validates an address list the same way address.validate_list does it,
+    looking up distinct domains concurrently, each of them once.
+
+    Returns results as a list or tuple consisting of the parsed addresses
+    and unparsable portions. If requested, will also return the processing
+    time metrics.
+    """
+    mtimes = address._validation_mtimes()
+
+    plist = address.AddressList()
+    ulist = []
+    if addr_list:
+        # run parser against address list
+        bstart = time()
+        parsed_addresses, ulist = address.parse_list(addr_list, strict=True,
+                                                     as_tuple=True)
+        mtimes['parsing'] = time() - bstart
+
+        paddrs = [address._validate_syntax(paddr.address, mtimes)
+                  for paddr in parsed_addresses]
+
+        exchangers = {}
+        if not skip_remote_checks:
+            domains = list(set(p.hostname for p in paddrs if p is not None))
+            lookups = await asyncio.gather(
+                *[mail_exchanger_lookup_async(domain, metrics=True)
+                  for domain in domains])
+            for domain, (exchanger, mx_metrics) in zip(domains, lookups):
+                exchangers[domain] = exchanger
+                address._add_mtimes(mtimes, mx_metrics)
+
+        for parsed, paddr in zip(parsed_addresses, paddrs):
+            if paddr is not None and not skip_remote_checks:
+                paddr = address._validate_exchanger(
+                    paddr, exchangers[paddr.hostname], mtimes)
+            if paddr is None:
+                ulist.append(parsed.full_spec())
+            else:
+                plist.append(parsed)
+
+    result = (plist, ulist) if as_tuple else (plist,)
+    if metrics:
+        result += (mtimes,)
+    return result if len(result) > 1 else result[0]
+
+
+async def mail_exchanger_lookup_async(domain, metrics=False):
+    """
+    Looks up the mail exchanger for a domain the same way
+    validate.mail_exchanger_lookup does it, without blocking the event loop.
+    """
+    mtimes = {'mx_lookup': 0, 'dns_lookup': 0, 'mx_conn': 0}
+    exchanger = await _mail_exchanger_lookup(domain, mtimes)
+    if metrics:
+        return exchanger, mtimes
+    return exchanger
+
+
+async def _mail_exchanger_lookup(domain, mtimes):
+    mx_cache = _get_async_mx_cache()
+
+    # look in cache
+    bstart = time()
+    cache_value = await mx_cache.get(domain)
+    mtimes['mx_lookup'] = time() - bstart
+    if cache_value is not None:
+        return None if cache_value == 'False' else cache_value
+
+    # dns lookup on domain
+    if domain.startswith('[') and domain.endswith(']'):
+        mx_hosts = [domain[1:-1]]
+    else:
+        bstart = time()
+        mx_hosts = await _lookup_domain(domain)
+        if mx_hosts is None:
+            # try one more time
+            mx_hosts = await _lookup_domain(domain)
+        mtimes['dns_lookup'] = time() - bstart
+        if mx_hosts is None:
+            log.warning('failed mx lookup for %s', domain)
+            return None
+
+    # test connecting to the mx exchanger
+    bstart = time()
+    mail_exchanger = await connect_to_mail_exchanger_async(mx_hosts)
+    mtimes['mx_conn'] = time() - bstart
+    if mail_exchanger is None:
+        log.warning('failed mx connection for %s/%s', domain, mx_hosts)
+        return None
+
+    # valid mx records, connected to mail exchanger
+    await mx_cache.set(domain, mail_exchanger)
+    return mail_exchanger
+
+
+async def _lookup_domain(domain):
+    fqdn = domain if domain[-1] == '.' else ''.join([domain, '.'])
+    mx_hosts = list(await _get_async_dns_lookup().lookup(fqdn))
+    if len(mx_hosts) == 0:
+        return None
+    return mx_hosts
+
+
+async def connect_to_mail_exchanger_async(mx_hosts, delay=MX_CONN_DELAY,
+                                          timeout=MX_CONN_TIMEOUT):
+    """
+    Given a list of MX hosts, attempts to connect to at least one on port 25.
+    Returns the mail exchanger it was able to connect to or None.
+
+    Hosts are tried in order, but happy eyeballs style: if connecting to a
+    host takes longer than `delay` seconds, or fails, connecting to the next
+    one starts without waiting for the previous attempts to finish. The first
+    host connected to wins.
+    """
+    remaining = list(mx_hosts)
+    attempts = {}
+    pending = set()
+    try:
+        while remaining or pending:
+            if remaining:
+                host = remaining.pop(0)
+                attempt = asyncio.ensure_future(_probe(host, timeout))
+                attempts[attempt] = host
+                pending.add(attempt)
+
+            done, pending = await asyncio.wait(
+                pending, timeout=delay if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.result():
+                    return attempts[attempt]
+
+        return None
+    finally:
+        for attempt in pending:
+            attempt.cancel()
+
+
+async def _probe(host, timeout):
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, 25), timeout)
+    except Exception:
+        return False
+
+    writer.close()
+    return True
+
+
+def _get_async_mx_cache():
+    global _async_mx_cache
+    if _async_mx_cache is None:
+        _async_mx_cache = ExecutorMxCache()
+
+    return _async_mx_cache
+
+
+def _get_async_dns_lookup():
+    global _async_dns_lookup
+    if _async_dns_lookup is None:
+        _async_dns_lookup = ExecutorDNSLookup()
+
+    return _async_dns_lookup
@@ -61,6 +61,10 @@ read more in package details.
 """
 from flanker.mime.message.errors import DecodingError, EncodingError, MimeError
 from flanker.mime import create
-from flanker.mime.create import from_string
+from flanker.mime.create import (from_string, from_file, headers_from_string,
+                                 structure_index)
+from flanker.mime.message.index import StructureIndex
+from flanker.mime.bulk import parse_many
+from flanker.mime.message.scanner import FeedScanner
 from flanker.mime.message.fallback.create import from_string as recover
 from flanker.mime.message.headers.parametrized import fix_content_type
@@ -0,0 +1,179 @@
+"""
+Parsing of many messages on a process pool.
+
+The scanner is pure Python, so parsing does not scale with threads. To
+process a large corpus messages are parsed in worker processes, and only
+what the caller extracts from each message is sent back:
+
+    >>> def subject(message):
+    ...     return message.subject
+    >>> for result in parse_many(messages, subject, workers=4):
+    ...     if result.error:
+    ...         log.warning('cannot parse #%d: %s', result.index, result.error)
+    ...     else:
+    ...         print(result.value)
+
+Both the extract function and its results must be picklable, so the extract
+function has to be defined at a module level.
+"""
+import multiprocessing
+from collections import deque, namedtuple
+
+import six
+from six.moves import cPickle as pickle
+from six.moves import queue
+
+from flanker.mime.create import from_string
+from flanker.mime.message.errors import DecodingError
+
+# Messages sent to a worker at once, so that small messages do not cost a
+# round trip each.
+_CHUNK_SIZE = 16
+
+# Chunks submitted per worker that may be not consumed yet.
+_PENDING_PER_WORKER = 2
+
+# Seconds between checks for failed tasks on Python 2.
+_POLL_INTERVAL = 0.1
+
+ParseResult = namedtuple('ParseResult', ['index', 'value', 'error'])
+
+
+def parse_many(sources, extract, workers=None, ordered=True,
+               keep_bytes=False, chunk_size=_CHUNK_SIZE):
+    """
+    Parses messages from the `sources` iterable with `from_string` on a pool
+    of `workers` processes, the number of CPUs by default, and runs
+    `extract` against every parsed message in a worker.
+
+    Yields a ParseResult for every message: its position in `sources`, the
+    value returned by `extract` and the DecodingError the message failed
+    with, if any. Results are yielded in the order of sources, or as soon
+    as they are ready if `ordered` is False. Other errors are re-raised.
+
+    Sources are read only as fast as results are consumed, so a lazy
+    iterable over a huge corpus is never loaded into memory at once.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    max_pending = workers * _PENDING_PER_WORKER
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        chunks = _chunks(sources, chunk_size)
+        if ordered:
+            results = _ordered(pool, chunks, extract, keep_bytes, max_pending)
+        else:
+            results = _unordered(pool, chunks, extract, keep_bytes,
+                                 max_pending)
+
+        for chunk_results in results:
+            for result in chunk_results:
+                if result.error is not None and not isinstance(
+                        result.error, DecodingError):
+                    raise result.error
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _ordered(pool, chunks, extract, keep_bytes, max_pending):
+    pending = deque()
+    for chunk in chunks:
+        if len(pending) >= max_pending:
+            yield pickle.loads(pending.popleft().get())
+        pending.append(
+            pool.apply_async(_parse_chunk, (chunk, extract, keep_bytes)))
+
+    while pending:
+        yield pickle.loads(pending.popleft().get())
+
+
+def _unordered(pool, chunks, extract, keep_bytes, max_pending):
+    done = queue.Queue()
+    callbacks = {'callback': done.put}
+    if six.PY3:
+        # A task that fails in the pool itself never gets to the callback.
+        callbacks['error_callback'] = done.put
+
+    pending = 0
+    submitted = []
+    for chunk in chunks:
+        if pending >= max_pending:
+            yield _unordered_result(_wait(done, submitted))
+            pending -= 1
+        submitted.append(pool.apply_async(
+            _parse_chunk, (chunk, extract, keep_bytes), **callbacks))
+        pending += 1
+        # Only tasks that may still fail are kept.
+        submitted = [r for r in submitted
+                     if not (r.ready() and r.successful())]
+
+    while pending:
+        yield _unordered_result(_wait(done, submitted))
+        pending -= 1
+
+
+def _wait(done, submitted):
+    """
+    Returns the next result put on the `done` queue. Python 2 has no error
+    callbacks, so tasks that failed in the pool itself are checked while
+    waiting, and their errors are raised.
+    """
+    if six.PY3:
+        return done.get()
+
+    while True:
+        try:
+            return done.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            for result in submitted:
+                if result.ready() and not result.successful():
+                    result.get()
+
+
+def _unordered_result(result):
+    if isinstance(result, BaseException):
+        raise result
+    return pickle.loads(result)
+
+
+def _chunks(sources, chunk_size):
+    chunk = []
+    for index, source in enumerate(sources):
+        chunk.append((index, source))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_chunk(chunk, extract, keep_bytes):
+    # Errors are returned rather than raised, for a failed task would never
+    # get to the callback of the unordered mode.
+    results = []
+    for index, source in chunk:
+        try:
+            value = extract(from_string(source, keep_bytes=keep_bytes))
+            results.append(ParseResult(index, value, None))
+        except Exception as e:
+            results.append(ParseResult(index, None, e))
+
+    # Results are pickled here, so that a result that cannot be pickled
+    # is returned as an error of its message instead of failing the task.
+    try:
+        return pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return pickle.dumps([_picklable(r) for r in results],
+                            pickle.HIGHEST_PROTOCOL)
+
+
+def _picklable(result):
+    try:
+        pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        return result
+    except Exception as e:
+        return ParseResult(result.index, None, pickle.PicklingError(
+            'Cannot send back the result of message #{0}: {1!r}'.format(
+                result.index, e)))
@@ -2,14 +2,20 @@
 This package is a set of utilities and methods for building mime messages.
 """
 
+import mmap
+import os
 import uuid
 
+import six
+
 from flanker import _email
 from flanker.mime import DecodingError
 from flanker.mime.message import ContentType, scanner
+from flanker.mime.message.index import StructureIndex
 from flanker.mime.message.headers import WithParams
 from flanker.mime.message.headers.parametrized import fix_content_type
-from flanker.mime.message.part import MimePart, Body, Part, adjust_content_type
+from flanker.mime.message.part import (MimePart, Body, Part, FileBody,
+                                       adjust_content_type, is_file_body)
 
 
 def multipart(subtype):
@@ -41,6 +47,11 @@ def text(subtype, body, charset=None, disposition=None, filename=None):
 
 def binary(maintype, subtype, body, filename=None,
            disposition=None, charset=None, trust_ctype=False):
+    """Builds a part with a binary body. The body can also be a file object or
+    a path-like object, then the file is read and base64 encoded chunk by
+    chunk each time the message is serialized. Plain strings are always
+    treated as the body content, not as paths.
+    """
     return MimePart(
         container=Body(
             content_type=ContentType(maintype, subtype),
@@ -56,7 +67,8 @@ def attachment(content_type, body, filename=None,
                disposition=None, charset=None):
     """Smarter method to build attachments that detects the proper content type
     and form of the message based on content type string, body and filename
-    of the attachment
+    of the attachment. The body can be a file object or a path-like object,
+    see `binary`.
     """
 
     # fix and sanitize content type string and get main and sub parts:
@@ -68,6 +80,8 @@ def attachment(content_type, body, filename=None,
         ContentType(main, sub), body, filename)
 
     if content_type.main == 'message':
+        if is_file_body(body):
+            body = FileBody(body).read()
         try:
             message = message_container(from_string(body))
             message.headers['Content-Disposition'] = WithParams(disposition)
@@ -82,8 +96,60 @@ def attachment(content_type, body, filename=None,
         charset, True)
 
 
-def from_string(string):
-    return scanner.scan(string)
+def from_string(string, keep_bytes=False):
+    return scanner.scan(string, keep_bytes=keep_bytes)
+
+
+def headers_from_string(string, keep_bytes=False):
+    """
+    Parses only the top-level headers of a message, the rest of the message
+    is not even looked at. Returns an object with `headers` and the offset of
+    the body `body_start`, call its `to_message` method to get the entire
+    message without parsing the headers again.
+    """
+    return scanner.scan_headers(string, keep_bytes=keep_bytes)
+
+
+def from_file(path_or_fd, index=None):
+    """
+    Parses a message from a file given by a path, a file descriptor or a file
+    object. The file is memory mapped rather than read, so parts of the message
+    are copied into memory only when they are accessed. The message is scanned
+    as binary, see `from_string` `keep_bytes` parameter. The file must not be
+    modified while the message is in use.
+
+    If a `StructureIndex` of the message is given, the message is not scanned,
+    the message tree is built from the index instead.
+    """
+    if isinstance(path_or_fd, six.integer_types):
+        return _from_fd(path_or_fd, index)
+
+    if hasattr(path_or_fd, 'fileno'):
+        return _from_fd(path_or_fd.fileno(), index)
+
+    with open(path_or_fd, 'rb') as f:
+        return _from_fd(f.fileno(), index)
+
+
+def _from_fd(fd, index):
+    # empty files cannot be mapped.
+    if os.fstat(fd).st_size == 0:
+        string = b''
+    else:
+        string = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+    if index is not None:
+        return index.to_message(string)
+    return scanner.scan(string, keep_bytes=True)
+
+
+def structure_index(message):
+    """
+    Returns `StructureIndex` of a message that has just been parsed. Store it
+    along with the message to parse the message later without scanning it,
+    see `from_file` and `StructureIndex.to_message`.
+    """
+    return StructureIndex.from_message(message)
 
 
 def from_python(message):
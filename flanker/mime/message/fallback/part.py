@@ -1,13 +1,13 @@
 import logging
 
 import six
-from webob.multidict import MultiDict
 
 from flanker import _email
 from flanker.mime.message import headers
 from flanker.mime.message.charsets import convert_to_unicode
 from flanker.mime.message.headers import parametrized, normalize
 from flanker.mime.message.headers.headers import remove_newlines, MimeHeaders
+from flanker.mime.message.headers.multidict import MultiDict
 from flanker.mime.message.part import RichPartMixin
 from flanker.mime.message.scanner import ContentType
 
@@ -156,6 +156,7 @@ class FallbackHeaders(MimeHeaders):
             self._m._headers = transformed_headers
             self._v = MultiDict([(normalize(k), remove_newlines(v))
                                  for k, v in transformed_headers])
+            self._decoded.clear()
             self.changed = True
 
 
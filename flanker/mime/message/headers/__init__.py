@@ -1,6 +1,8 @@
 from flanker.mime.message.headers.headers import MimeHeaders
 from flanker.mime.message.headers.encodedword import mime_to_unicode
-from flanker.mime.message.headers.parsing import normalize, is_empty, parse_header_value
+from flanker.mime.message.headers.parsing import (normalize, is_empty,
+                                                  parse_header_value,
+                                                  skip_header_lines)
 from flanker.mime.message.headers.encoding import to_mime
 from flanker.mime.message.headers.parametrized import is_parametrized
 from flanker.mime.message.headers.wrappers import WithParams, ContentType, MessageId, Subject
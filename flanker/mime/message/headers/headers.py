@@ -1,10 +1,13 @@
 import six
-from webob.multidict import MultiDict
 
 from flanker.mime.message.headers import encodedword
-from flanker.mime.message.headers.parsing import normalize, parse_stream
+from flanker.mime.message.headers.multidict import MultiDict
+from flanker.mime.message.headers.parsing import normalize, parse_stream_raw
 from flanker.mime.message.headers.encoding import to_mime
+from flanker.mime.message.headers.parametrized import LazyParams
+from flanker.mime.message.headers.wrappers import ContentType, WithParams
 from flanker.mime.message.errors import EncodingError
+from flanker.utils import is_pure_ascii
 
 
 class MimeHeaders(object):
@@ -16,13 +19,40 @@ class MimeHeaders(object):
     def __init__(self, items=()):
         self._v = MultiDict([(normalize(key), remove_newlines(val))
                              for (key, val) in items])
-        self.changed = False
+        self._changed = False
         self.num_prepends = 0
+        # Decoded header values by raw values, cleared when headers change.
+        self._decoded = {}
+        # Called with `prepend` flag when the headers change.
+        self._on_change = None
+
+    @property
+    def changed(self):
+        return self._changed
+
+    @changed.setter
+    def changed(self, value):
+        self._changed = value
+        if value:
+            self._notify(prepend=False)
+
+    def _notify(self, prepend):
+        if self._on_change is not None:
+            self._on_change(prepend)
+
+    def _decode(self, value):
+        if not isinstance(value, six.string_types):
+            return value
+
+        decoded = self._decoded.get(value)
+        if decoded is None:
+            decoded = self._decoded[value] = encodedword.decode(value)
+        return decoded
 
     def __getitem__(self, key):
         v = self._v.get(normalize(key), None)
         if v is not None:
-            return encodedword.decode(v)
+            return self._decode(v)
         return None
 
     def __len__(self):
@@ -38,20 +68,24 @@ class MimeHeaders(object):
         key = normalize(key)
         if key in self._v:
             self._v[key] = remove_newlines(value)
+            self._decoded.clear()
             self.changed = True
         else:
             self.prepend(key, remove_newlines(value))
 
     def __delitem__(self, key):
         del self._v[normalize(key)]
+        self._decoded.clear()
         self.changed = True
 
     def __nonzero__(self):
         return len(self._v) > 0
 
     def prepend(self, key, value):
-        self._v._items.insert(0, (normalize(key), remove_newlines(value)))
+        self._v.prepend(normalize(key), remove_newlines(value))
+        self._decoded.clear()
         self.num_prepends += 1
+        self._notify(prepend=True)
 
     def add(self, key, value):
         """Adds header without changing the
@@ -71,17 +105,21 @@ class MimeHeaders(object):
         a new pair of key, val and applies the function to all
         header, value pairs in the message.
         """
-        changed = [False]
+        changed = False
+        v = MultiDict()
+        for key, val, raw in self._v.iterextras():
+            if decode:
+                val = self._decode(val)
 
-        def wrapper(key, val):
             new_key, new_val = fn(key, val)
             if new_val != val or new_key != key:
-                changed[0] = True
-            return new_key, new_val
+                changed = True
+                raw = None
+            v.add(new_key, new_val, raw)
 
-        v = MultiDict(wrapper(k, v) for k, v in self.iteritems(raw=not decode))
-        if changed[0]:
+        if changed:
             self._v = v
+            self._decoded.clear()
             self.changed = True
 
     def items(self):
@@ -97,7 +135,7 @@ class MimeHeaders(object):
         if raw:
             return self._v.iteritems()
 
-        return iter([(x[0], encodedword.decode(x[1]))
+        return iter([(x[0], self._decode(x[1]))
                      for x in self._v.iteritems()])
 
     def get(self, key, default=None):
@@ -106,7 +144,7 @@ class MimeHeaders(object):
         """
         v = self._v.get(normalize(key), default)
         if v is not None:
-            return encodedword.decode(v)
+            return self._decode(v)
         return None
 
     def getraw(self, key, default=None):
@@ -120,7 +158,7 @@ class MimeHeaders(object):
         Returns all header values by the given header name (case-insensitive).
         """
         v = self._v.getall(normalize(key))
-        return [encodedword.decode(x) for x in v]
+        return [self._decode(x) for x in v]
 
     def have_changed(self, ignore_prepends=False):
         """
@@ -135,19 +173,35 @@ class MimeHeaders(object):
     def from_stream(cls, stream):
         """
         Takes a stream and reads the headers, decodes headers to unicode dict
-        like object.
-        """
-        return cls(parse_stream(stream))
+        like object. Raw headers are kept, so the headers that do not change
+        are serialized exactly as they were.
+        """
+        headers = cls()
+        for key, value, raw in parse_stream_raw(stream):
+            # Non-ascii headers are encoded anew, for the charset of the raw
+            # header is not known.
+            if not is_pure_ascii(raw):
+                raw = None
+            # Raw headers are written along with generated ones, so they
+            # have to end lines the same way.
+            elif raw.count('\n') != raw.count('\r\n'):
+                raw = raw.replace('\r\n', '\n').replace('\n', '\r\n')
+            headers._v.add(key, remove_newlines(value), raw)
+        return headers
 
     def to_stream(self, stream, prepends_only=False):
         """
         Takes a stream and serializes headers in a mime format.
         """
         i = 0
-        for h, v in self.iteritems(raw=True):
+        for h, v, raw in self._v.iterextras():
             if prepends_only and i == self.num_prepends:
                 break
             i += 1
+            if raw is not None and _is_parsed(v):
+                stream.write(raw)
+                continue
+
             try:
                 h.encode('ascii')
             except UnicodeDecodeError:
@@ -155,6 +209,18 @@ class MimeHeaders(object):
             stream.write("{0}: {1}\r\n".format(h, to_mime(h, v)))
 
 
+def _is_parsed(value):
+    """
+    Tells whether a header value is still the one parsed from its raw
+    header. Parameters of content headers can be changed in place, while
+    other values are only replaced.
+    """
+    if isinstance(value, (WithParams, ContentType)):
+        params = tuple.__getitem__(value, 1)
+        return params.__class__ is LazyParams and not params.changed()
+    return True
+
+
 def remove_newlines(value):
     if not value:
         return ''
@@ -0,0 +1,165 @@
+"""
+Multi dictionary that keeps headers in order and indexes them by name.
+
+Messages may have hundreds of Received and X-* headers, so lookups by name
+go through an index of positions instead of scanning all headers, and
+headers are prepended in constant time.
+"""
+from collections import deque
+
+
+class MultiDict(object):
+    """
+    Order preserving dictionary with multiple values per key. It behaves
+    as `webob.multidict.MultiDict` does: `get` and `__getitem__` return the
+    last value of a key, `__setitem__` replaces all values of a key with a
+    single value at the end.
+
+    Items can carry extra data, e.g. raw headers they were parsed from,
+    which is dropped along with the items when they are replaced or deleted.
+    """
+
+    def __init__(self, items=()):
+        # Prepended items are kept in reverse order, the last one goes
+        # first. Deleted items are left as None until the lists are
+        # compacted.
+        self._front = []
+        self._back = []
+        self._deleted = 0
+        # Positions of items by key in the order of items. An item at
+        # position p >= 0 is _back[p], at p < 0 it is _front[-p - 1].
+        self._index = {}
+        # Extra data of items by positions.
+        self._extras = {}
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key, value, extra=None):
+        """
+        Adds the value at the end, the other values of the key are kept.
+        """
+        self._back.append((key, value))
+        position = len(self._back) - 1
+        positions = self._index.get(key)
+        if positions is None:
+            positions = self._index[key] = deque()
+        positions.append(position)
+        if extra is not None:
+            self._extras[position] = extra
+
+    def prepend(self, key, value, extra=None):
+        """
+        Adds the value at the beginning, the other values of the key are
+        kept.
+        """
+        self._front.append((key, value))
+        position = -len(self._front)
+        positions = self._index.get(key)
+        if positions is None:
+            positions = self._index[key] = deque()
+        positions.appendleft(position)
+        if extra is not None:
+            self._extras[position] = extra
+
+    def get(self, key, default=None):
+        positions = self._index.get(key)
+        if positions:
+            return self._item(positions[-1])[1]
+        return default
+
+    def getall(self, key):
+        """
+        Returns all values of the key, may be an empty list.
+        """
+        return [self._item(p)[1] for p in self._index.get(key, ())]
+
+    def __getitem__(self, key):
+        positions = self._index.get(key)
+        if not positions:
+            raise KeyError(key)
+        return self._item(positions[-1])[1]
+
+    def __setitem__(self, key, value):
+        if key in self._index:
+            self._remove(key)
+        self.add(key, value)
+
+    def __delitem__(self, key):
+        if key not in self._index:
+            raise KeyError(key)
+        self._remove(key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._front) + len(self._back) - self._deleted
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def iterkeys(self):
+        for key, _ in self.iteritems():
+            yield key
+
+    def iteritems(self):
+        for item in reversed(self._front):
+            if item is not None:
+                yield item
+        for item in self._back:
+            if item is not None:
+                yield item
+
+    def iterextras(self):
+        """
+        Returns iterator over key, value, extra data triples of items, the
+        extra data is None for items that have none.
+        """
+        extras = self._extras
+        for i in range(len(self._front) - 1, -1, -1):
+            item = self._front[i]
+            if item is not None:
+                yield item + (extras.get(-i - 1),)
+        for i, item in enumerate(self._back):
+            if item is not None:
+                yield item + (extras.get(i),)
+
+    def keys(self):
+        return [key for key, _ in self.iteritems()]
+
+    def values(self):
+        return [value for _, value in self.iteritems()]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def __repr__(self):
+        return '{0}([{1}])'.format(
+            self.__class__.__name__,
+            ', '.join('({0!r}, {1!r})'.format(k, v)
+                      for k, v in self.iteritems()))
+
+    def _item(self, position):
+        if position >= 0:
+            return self._back[position]
+        return self._front[-position - 1]
+
+    def _remove(self, key):
+        for position in self._index.pop(key):
+            if position >= 0:
+                self._back[position] = None
+            else:
+                self._front[-position - 1] = None
+            self._extras.pop(position, None)
+            self._deleted += 1
+
+        # Deleted items are dropped once they take most of the lists.
+        if self._deleted > len(self):
+            self._compact()
+
+    def _compact(self):
+        items = list(self.iterextras())
+        self._front, self._back, self._deleted = [], [], 0
+        self._index, self._extras = {}, {}
+        for key, value, extra in items:
+            self.add(key, value, extra)
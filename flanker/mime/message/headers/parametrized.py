@@ -15,12 +15,15 @@ _PARAM_STYLE_OLD = 'old'
 _PARAM_STYLE_NEW = 'new'
 
 
-def decode(header):
+def decode(header, lazy=False):
     """Accepts parameterized header value (encoded in accordance to
      rfc2231 (new style) or rfc1342 (old style)
      and returns tuple:
          value, {'key': u'val'}
      returns None in case of any failure
+
+     With `lazy` the parameters are returned as `LazyParams`, which are
+     decoded when they are accessed through a header value wrapper.
     """
     if six.PY3 and isinstance(header, six.binary_type):
         header = header.decode('utf-8')
@@ -29,9 +32,54 @@ def decode(header):
     if value is None:
         return None, {}
 
+    if lazy:
+        return value, LazyParams(rest)
     return value, decode_parameters(rest)
 
 
+class LazyParams(dict):
+    """
+    Parameters of a header value that are decoded on first access. Header
+    value wrappers load them when their `params` are accessed, then the
+    dictionary can be used and changed as usual. The decoded parameters
+    are kept aside to tell whether they have been changed.
+    """
+    __slots__ = ('_string', '_decoded')
+
+    def __init__(self, string):
+        dict.__init__(self)
+        self._string = string
+        self._decoded = None
+
+    # Python 2 pickles objects with slots only given their state.
+    def __getstate__(self):
+        return self._string, self._decoded
+
+    def __setstate__(self, state):
+        self._string, self._decoded = state
+
+    def load(self):
+        string = self._string
+        if string is not None:
+            decoded = decode_parameters(string)
+            self.update(decoded)
+            self._decoded = decoded
+            self._string = None
+
+    def changed(self):
+        return self._string is None and self != self._decoded
+
+    def may_have(self, name):
+        """
+        Tells whether the parameter may be there, without decoding the
+        parameters if they are not decoded yet.
+        """
+        string = self._string
+        if string is None:
+            return name in self
+        return name in string.lower()
+
+
 def is_parametrized(name, value):
     return name in ('Content-Type',
                     'Content-Disposition',
@@ -1,5 +1,7 @@
 import string
+
 import regex
+import six
 from collections import deque
 from flanker.mime.message.headers import encodedword, parametrized
 from flanker.mime.message.headers.wrappers import ContentType, WithParams
@@ -8,21 +10,78 @@ from flanker.mime.message.utils import to_unicode
 from flanker.utils import is_pure_ascii
 
 _RE_HEADER = regex.compile(r'^(From |[\041-\071\073-\176]+:|[\t ])')
+_RE_HEADER_BYTES = regex.compile(br'^(From |[\041-\071\073-\176]+:|[\t ])')
+
+_EMPTY_LINES = ('\r\n', '\r', '\n', b'\r\n', b'\r', b'\n')
+
+
+# Standard header names the table of normalized names starts with: RFC 5322,
+# MIME, DKIM, ARC, mailing list and delivery status headers.
+_KNOWN_NAMES = (
+    'Date', 'From', 'Sender', 'Reply-To', 'To', 'Cc', 'Bcc', 'Message-Id',
+    'In-Reply-To', 'References', 'Subject', 'Comments', 'Keywords',
+    'Resent-Date', 'Resent-From', 'Resent-Sender', 'Resent-To', 'Resent-Cc',
+    'Resent-Bcc', 'Resent-Message-Id', 'Return-Path', 'Received',
+    'Mime-Version', 'Content-Type', 'Content-Transfer-Encoding', 'Content-Id',
+    'Content-Description', 'Content-Disposition', 'Content-Language',
+    'Content-Location', 'Content-Md5', 'Content-Base',
+    'Dkim-Signature', 'Domainkey-Signature', 'Authentication-Results',
+    'Received-Spf', 'Arc-Seal', 'Arc-Message-Signature',
+    'Arc-Authentication-Results', 'List-Id', 'List-Help', 'List-Subscribe',
+    'List-Unsubscribe', 'List-Unsubscribe-Post', 'List-Post', 'List-Owner',
+    'List-Archive', 'Precedence', 'Auto-Submitted', 'Delivered-To',
+    'Errors-To', 'Disposition-Notification-To', 'Original-Recipient',
+    'Final-Recipient', 'Original-Envelope-Id', 'Reporting-Mta', 'Remote-Mta',
+    'Action', 'Status', 'Diagnostic-Code', 'Arrival-Date', 'Last-Attempt-Date',
+    'User-Agent', 'Importance', 'Priority', 'Thread-Topic', 'Thread-Index',
+    'X-Mailer', 'X-Priority', 'X-Original-To', 'X-Failed-Recipients',
+    'X-Spam-Status', 'X-Spam-Flag', 'X-Spam-Score')
+
+# Normalized header names by the names they were normalized from, normalized
+# names map to themselves. Headers of all messages share the normalized names,
+# the table is bounded for the names come from messages.
+_NORMALIZED_NAMES = {}
+_MAX_NORMALIZED_NAMES = 4096
+
+for _name in _KNOWN_NAMES:
+    _NORMALIZED_NAMES[_name] = _NORMALIZED_NAMES[_name.lower()] = _name
 
 
 def normalize(header_name):
-    return string.capwords(header_name.lower(), '-')
+    normalized = _NORMALIZED_NAMES.get(header_name)
+    if normalized is not None:
+        return normalized
+
+    normalized = string.capwords(header_name.lower(), '-')
+    if len(_NORMALIZED_NAMES) < _MAX_NORMALIZED_NAMES:
+        normalized = _NORMALIZED_NAMES.setdefault(normalized, normalized)
+        _NORMALIZED_NAMES[header_name] = normalized
+    return normalized
 
 
 def parse_stream(stream):
     """Reads the incoming stream and returns list of tuples"""
     out = deque()
-    for header in _unfold_header_lines(_read_header_lines(stream)):
+    for header, _ in _unfold_header_lines(_read_header_lines(stream)):
         out.append(parse_header(header))
 
     return out
 
 
+def parse_stream_raw(stream):
+    """
+    Same as `parse_stream`, but every tuple also has the raw header as it is
+    in the stream, folded and with the line break at the end.
+    """
+    out = deque()
+    for header, raw in _unfold_header_lines(_read_header_lines(stream)):
+        if not raw.endswith('\n'):
+            raw = raw.rstrip('\r') + '\r\n'
+        out.append(parse_header(header) + (raw,))
+
+    return out
+
+
 def parse_header(header):
     """ Accepts a raw header with name, colons and newlines
     and returns it's parsed value
@@ -38,7 +97,9 @@ def parse_header_value(name, val):
     if not is_pure_ascii(val):
         val = to_unicode(val)
     if parametrized.is_parametrized(name, val):
-        val, params = parametrized.decode(val)
+        # Parameters are decoded when they are accessed, most of them never
+        # are.
+        val, params = parametrized.decode(val, lazy=True)
         if val is not None and not is_pure_ascii(val):
             raise DecodingError('Non-ascii content header value')
         if name == 'Content-Type':
@@ -51,20 +112,45 @@ def parse_header_value(name, val):
 
 
 def is_empty(line):
-    return line in ('\r\n', '\r', '\n')
+    return line in _EMPTY_LINES
+
+
+def skip_header_lines(fp):
+    """
+    Moves the stream to the start of the body the way `parse_stream` does,
+    but the headers are not parsed.
+    """
+    _read_raw_header_lines(fp)
 
 
 def _read_header_lines(fp):
     """Read lines with headers until the start of body"""
+    lines = _read_raw_header_lines(fp)
+    # headers of a message scanned as binary are decoded all at once, the
+    # way the entire message is decoded when it is scanned as text.
+    if six.PY3 and lines and isinstance(lines[0], six.binary_type):
+        block = to_unicode(b''.join(lines)).split('\n')
+        lines = deque(line + '\n' for line in block[:-1])
+        if block[-1]:
+            lines.append(block[-1])
+    return lines
+
+
+def _read_raw_header_lines(fp):
     lines = deque()
-    for line in fp:
-        if is_empty(line):
+    while True:
+        line = fp.readline()
+        if not line or is_empty(line):
             break
 
         # tricky case if it's not a header and not an empty line
         # usually means that user forgot to separate the body and newlines
         # so "unread" this line here, what means to treat it like a body
-        if not _RE_HEADER.match(line):
+        if isinstance(line, six.text_type):
+            is_header = _RE_HEADER.match(line)
+        else:
+            is_header = _RE_HEADER_BYTES.match(line)
+        if not is_header:
             fp.seek(fp.tell() - len(line))
             break
 
@@ -74,6 +160,9 @@ def _read_header_lines(fp):
 
 
 def _unfold_header_lines(lines):
+    """
+    Returns unfolded headers along with the raw lines they consist of.
+    """
     headers = deque()
     for line in lines:
         # ignore unix from
@@ -90,10 +179,9 @@ def _unfold_header_lines(lines):
     new_headers = deque()
     for h in headers:
         if isinstance(h, deque):
-            new_headers.append(''.join(h).rstrip('\r\n'))
-            continue
+            h = ''.join(h)
 
-        new_headers.append(h.rstrip('\r\n'))
+        new_headers.append((h.rstrip('\r\n'), h))
 
     return new_headers
 
@@ -6,12 +6,20 @@ import six
 
 import flanker.addresslib.address
 from flanker import _email
+from flanker.mime.message.headers.parametrized import LazyParams
 
 
 class WithParams(tuple):
+    # Parameters may be `LazyParams` that are decoded on first access, so
+    # the items are always accessed through `params`.
+    __slots__ = ()
 
     def __new__(self, value, params=None):
-        return tuple.__new__(self, (value, params or {}))
+        return tuple.__new__(
+            self, (value, params if params is not None else {}))
+
+    def __getnewargs__(self):
+        return tuple(self)
 
     @property
     def value(self):
@@ -19,18 +27,49 @@ class WithParams(tuple):
 
     @property
     def params(self):
-        return tuple.__getitem__(self, 1)
+        return _load_params(self)
+
+    def __iter__(self):
+        return iter((self.value, self.params))
+
+    def __getitem__(self, index):
+        return (self.value, self.params)[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, tuple):
+            return False
+
+        _load_params(self)
+        _load_params(other)
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return repr((self.value, self.params))
 
 
 class ContentType(tuple):
+    # There can be thousands of parts in a message, so content types have no
+    # attributes of their own, main and sub types are taken from the value.
+    __slots__ = ()
 
     def __new__(self, main, sub, params=None):
         return tuple.__new__(
-            self, (main.lower() + '/' + sub.lower(), params or {}))
+            self, (_intern_value(main.lower() + '/' + sub.lower()),
+                   params if params is not None else {}))
+
+    def __getnewargs__(self):
+        return self.main, self.sub, self.params
 
-    def __init__(self, main, sub, params={}):
-        self.main = main
-        self.sub = sub
+    @property
+    def main(self):
+        return tuple.__getitem__(self, 0).partition('/')[0]
+
+    @property
+    def sub(self):
+        return tuple.__getitem__(self, 0).partition('/')[2]
 
     @property
     def value(self):
@@ -38,15 +77,21 @@ class ContentType(tuple):
 
     @property
     def params(self):
-        return tuple.__getitem__(self, 1)
+        return _load_params(self)
+
+    def __iter__(self):
+        return iter((self.value, self.params))
+
+    def __getitem__(self, index):
+        return (self.value, self.params)[index]
 
     @property
     def format_type(self):
-        return tuple.__getitem__(self, 0).split('/')[0]
+        return self.main
 
     @property
     def subtype(self):
-        return tuple.__getitem__(self, 0).split('/')[1]
+        return self.sub
 
     def is_content_type(self):
         return True
@@ -93,6 +138,11 @@ class ContentType(tuple):
         return self == 'multipart/report'
 
     def get_boundary(self):
+        # The scanner looks for boundaries of all parts, so parameters of
+        # parts that cannot have one are not decoded.
+        params = tuple.__getitem__(self, 1)
+        if params.__class__ is LazyParams and not params.may_have('boundary'):
+            return None
         return self.params.get("boundary")
 
     def get_boundary_line(self, final=False):
@@ -110,17 +160,15 @@ class ContentType(tuple):
         self.params["charset"] = value.lower()
 
     def __str__(self):
-        return "{0}/{1}".format(self.main, self.sub)
+        return str(tuple.__getitem__(self, 0))
 
     def __eq__(self, other):
-        if isinstance(other, ContentType):
-            return self.main == other.main \
-                and self.sub == other.sub \
-                and self.params == other.params
-        elif isinstance(other, tuple):
+        if isinstance(other, tuple):
+            _load_params(self)
+            _load_params(other)
             return tuple.__eq__(self, other)
         elif isinstance(other, six.string_types):
-            return str(self) == other
+            return tuple.__getitem__(self, 0) == other
         else:
             return False
 
@@ -132,6 +180,36 @@ class ContentType(tuple):
                                                       self.params)
 
 
+def _load_params(value):
+    """
+    Returns parameters of a header value wrapper, decoding them first if
+    they are lazy.
+    """
+    if not isinstance(value, (WithParams, ContentType)):
+        return None
+
+    params = tuple.__getitem__(value, 1)
+    if params.__class__ is LazyParams:
+        params.load()
+    return params
+
+
+# Content type values are shared by all content types with the same value,
+# the table is bounded for the values come from messages.
+_INTERNED_VALUES = {}
+_MAX_INTERNED_VALUES = 1024
+
+
+def _intern_value(value):
+    interned = _INTERNED_VALUES.get(value)
+    if interned is not None:
+        return interned
+
+    if len(_INTERNED_VALUES) < _MAX_INTERNED_VALUES:
+        _INTERNED_VALUES[value] = value
+    return value
+
+
 class MessageId(str):
 
     RE_ID = re.compile("<([^<>]+)>", re.I)
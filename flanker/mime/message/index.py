@@ -0,0 +1,155 @@
+"""
+Structure index of a scanned message: the part tree with content types and
+offsets of every part in the message. It can be stored next to the message
+and used to rebuild the message tree without scanning the message again:
+
+    >>> message = mime.from_string(string)
+    >>> data = StructureIndex.from_message(message).dumps()
+    ...
+    >>> message = StructureIndex.loads(data).to_message(string)
+
+The rebuilt tree is lazy the same way a scanned one is, headers and bodies
+are parsed only when accessed, so with a memory mapped message only the
+parts that are actually used are read.
+"""
+import json
+
+import six
+
+from flanker.mime.message.errors import DecodingError
+from flanker.mime.message.headers import ContentType
+from flanker.mime.message.part import MimePart, Stream
+from flanker.mime.message import scanner
+
+INDEX_VERSION = 1
+
+
+class IndexEntry(object):
+    """
+    A part of an indexed message. Offsets are inclusive and point into the
+    message the way `Stream` offsets do: characters for text messages, bytes
+    for binary ones.
+    """
+
+    def __init__(self, content_type, start, body_start, end, parts=None,
+                 enclosed=None):
+        self.content_type = content_type
+        self.start = start
+        self.body_start = body_start
+        self.end = end
+        self.parts = parts or []
+        self.enclosed = enclosed
+
+    @property
+    def size(self):
+        """Size of the part including its headers."""
+        if self.start is None:
+            return 0
+        return self.end - self.start + 1
+
+    @property
+    def body_size(self):
+        if self.body_start is None:
+            return 0
+        return max(self.end - self.body_start + 1, 0)
+
+    def to_list(self):
+        return [self.content_type.main, self.content_type.sub,
+                self.content_type.params, self.start, self.body_start,
+                self.end, [p.to_list() for p in self.parts],
+                self.enclosed.to_list() if self.enclosed else None]
+
+    @classmethod
+    def from_list(cls, value):
+        try:
+            main, sub, params, start, body_start, end, parts, enclosed = value
+        except (TypeError, ValueError):
+            raise DecodingError('Malformed structure index entry')
+
+        return cls(ContentType(main, sub, params), start, body_start, end,
+                   [cls.from_list(p) for p in parts],
+                   cls.from_list(enclosed) if enclosed else None)
+
+
+class StructureIndex(object):
+
+    def __init__(self, root, size, binary):
+        self.root = root
+        self.size = size
+        self.binary = binary
+
+    @classmethod
+    def from_message(cls, message):
+        """
+        Makes an index of a message returned by the scanner. The message
+        must not be modified, for the index describes the original message
+        string.
+        """
+        container = message._container
+        if not isinstance(container, Stream) or message.was_changed():
+            raise DecodingError('Only unchanged scanned messages are indexed')
+
+        return cls(_make_entry(message), container.size,
+                   not isinstance(container.string, six.text_type))
+
+    def to_dict(self):
+        return {'version': INDEX_VERSION,
+                'size': self.size,
+                'binary': self.binary,
+                'root': self.root.to_list()}
+
+    @classmethod
+    def from_dict(cls, value):
+        if value.get('version') != INDEX_VERSION:
+            raise DecodingError(
+                'Unsupported structure index version: {0}'.format(
+                    value.get('version')))
+
+        return cls(IndexEntry.from_list(value['root']), value['size'],
+                   value['binary'])
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, data):
+        if isinstance(data, six.binary_type):
+            data = data.decode('utf-8')
+        return cls.from_dict(json.loads(data))
+
+    def to_message(self, string):
+        """
+        Builds the message tree of the indexed message over the given message
+        string, which can be memory mapped. That takes time proportional to
+        the number of parts, the message itself is not read.
+        """
+        string = scanner._prepare(string, keep_bytes=self.binary)
+        if (isinstance(string, six.text_type) == self.binary
+                or len(string) != self.size):
+            raise DecodingError('Structure index does not match the message')
+
+        return _make_part(self.root, string, True)
+
+
+def _make_entry(part):
+    container = part._container
+    # Enclosed parts located by the scanner may have no start at all.
+    body_start = None
+    if container.start is not None:
+        body_start = container._locate_body()
+
+    return IndexEntry(
+        container.content_type, container.start, body_start, container.end,
+        [_make_entry(p) for p in part.parts],
+        _make_entry(part.enclosed) if part.enclosed else None)
+
+
+def _make_part(entry, string, is_root=False):
+    container = Stream(entry.content_type, entry.start, entry.end, string,
+                       entry.body_start)
+    return MimePart(
+        container=container,
+        parts=[_make_part(p, string) for p in entry.parts],
+        enclosed=(_make_part(entry.enclosed, string)
+                  if entry.enclosed else None),
+        is_root=is_root)
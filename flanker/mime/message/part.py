@@ -1,9 +1,12 @@
 import base64
 import imghdr
+import io
 import logging
 import mimetypes
 import quopri
-from contextlib import closing
+import os
+from collections import OrderedDict
+from contextlib import closing, contextmanager
 from os import path
 
 import six
@@ -16,27 +19,61 @@ from flanker.mime.message.errors import EncodingError, DecodingError
 from flanker.mime.message.headers import (WithParams, ContentType, MessageId,
                                           Subject)
 from flanker.mime.message.headers.parametrized import fix_content_type
+from flanker.mime.message.utils import to_unicode
 from flanker.utils import is_pure_ascii
 
 log = logging.getLogger(__name__)
 
 CTE = WithParams('7bit', {})
 
+_BODY_CHUNK_SIZE = 64 * 1024
+
+# Content types are guessed from the first bytes of file bodies, audio
+# detection looks at 512 of them.
+_FILE_PREAMBLE_SIZE = 512
+
+# Multiple of 57 bytes, that make a line of encoded base64.
+_BASE64_CHUNK_SIZE = 57 * 1024
+
 
 class Stream(object):
+    """
+    A part of a scanned message, given by its offsets in the message string.
 
-    def __init__(self, content_type, start, end, string, stream):
+    The message string is only sliced, never read through a shared file
+    object, so parts of a message that is not modified can be read from
+    multiple threads at once.
+    """
+    __slots__ = ('content_type', 'start', 'end', 'string', '_owner',
+                 '_headers', '_body_start', '_body', '_body_is_changed')
+
+    def __init__(self, content_type, start, end, string, body_start=None):
         self.content_type = content_type
         self.start = start
         self.end = end
         self.string = string
-        self.stream = stream
+        # The part this is the container of, it is told about changes.
+        self._owner = None
 
         self._headers = None
-        self._body_start = None
+        # The body start can be known in advance, e.g. from an index.
+        self._body_start = body_start
         self._body = None
-        self._body_changed = False
-        self.size = len(self.string)
+        self._body_is_changed = False
+
+    @property
+    def size(self):
+        return len(self.string)
+
+    @property
+    def _body_changed(self):
+        return self._body_is_changed
+
+    @_body_changed.setter
+    def _body_changed(self, value):
+        self._body_is_changed = value
+        if value and self._owner is not None:
+            self._owner._on_change(body=True)
 
     @property
     def headers(self):
@@ -53,28 +90,85 @@ class Stream(object):
         self._set_body(value)
 
     def read_message(self):
-        self.stream.seek(self.start)
-        return self.stream.read(self.end - self.start + 1)
+        return self.string[self.start:self.end + 1]
 
     def read_body(self):
+        return self.string[self._locate_body():self.end + 1]
+
+    def message_view(self):
+        """
+        Same as `read_message`, but a binary message is not copied, a
+        memoryview slice of it is returned instead.
+        """
+        return self._view(self.start, self.end)
+
+    def body_view(self):
+        """
+        Same as `read_body`, but a binary message is not copied, a memoryview
+        slice of it is returned instead.
+        """
+        return self._view(self._locate_body(), self.end)
+
+    def open_body(self, chunk_size):
+        """
+        Returns a binary file object that reads the body with its transfer
+        encoding decoded chunk by chunk.
+        """
         self._load_headers()
-        self.stream.seek(self._body_start)
-        return self.stream.read(self.end - self._body_start + 1)
+        reader = _BodyReader(
+            self.string, self._body_start, self.end + 1,
+            self.headers.get('Content-Transfer-Encoding', CTE).value,
+            chunk_size)
+        return io.BufferedReader(reader, chunk_size)
+
+    def _view(self, start, end):
+        if six.PY3 and not isinstance(self.string, six.text_type):
+            return memoryview(self.string)[start:end + 1]
+
+        return self.string[start:end + 1]
 
     def _load_headers(self):
         if self._headers is None:
-            self.stream.seek(self.start)
-            self._headers = headers.MimeHeaders.from_stream(self.stream)
-            self._body_start = self.stream.tell()
+            reader = _LineReader(self.string, self.start)
+            message_headers = headers.MimeHeaders.from_stream(reader)
+            message_headers._on_change = self._headers_changed
+            # Set the body start first, for another thread can see headers
+            # loaded and go for the body straight away.
+            self._body_start = reader.tell()
+            self._headers = message_headers
+
+    def _locate_body(self):
+        """
+        Returns the body start, the headers are skipped rather than parsed
+        to find it.
+        """
+        if self._body_start is None:
+            reader = _LineReader(self.string, self.start)
+            headers.skip_header_lines(reader)
+            self._body_start = reader.tell()
+        return self._body_start
+
+    def _set_headers(self, message_headers, body_start):
+        """
+        Sets headers that have been parsed elsewhere.
+        """
+        message_headers._on_change = self._headers_changed
+        self._body_start = body_start
+        self._headers = message_headers
+        if message_headers.changed:
+            self._headers_changed(prepend=False)
+
+    def _headers_changed(self, prepend):
+        if self._owner is not None:
+            self._owner._on_change(prepend=prepend)
 
     def _load_body(self):
         if self._body is None:
             self._load_headers()
-            self.stream.seek(self._body_start)
             self._body = _decode_body(
                 self.content_type,
                 self.headers.get('Content-Transfer-Encoding', CTE).value,
-                self.stream.read(self.end - self._body_start + 1))
+                self.string[self._body_start:self.end + 1])
 
     def _set_body(self, value):
         if value != self._body:
@@ -95,6 +189,9 @@ class Stream(object):
 def adjust_content_type(content_type, body=None, filename=None):
     """Adjust content type based on filename or body contents
     """
+    if is_file_body(body):
+        body = FileBody(body).read(_FILE_PREAMBLE_SIZE)
+
     if filename and str(content_type) == 'application/octet-stream':
         # check if our internal guess returns anything
         guessed = _guess_type(filename)
@@ -143,11 +240,21 @@ def _guess_type(filename):
 class Body(object):
     def __init__(self, content_type, body, charset=None, disposition=None,
                  filename=None, trust_ctype=False):
+        # The part this is the container of, it is told about changes.
+        self._owner = None
         self.headers = headers.MimeHeaders()
-        self.body = body
+        self.headers._on_change = self._headers_changed
         self.disposition = disposition or ('attachment' if filename else None)
         self.filename = filename
-        self.size = len(body)
+
+        # file bodies are not read until the message is serialized.
+        self._file = None
+        if is_file_body(body):
+            self._file = FileBody(body)
+            self.size = self._file.size()
+        else:
+            self.size = len(body)
+        self._body = body
 
         if self.filename:
             self.filename = path.basename(self.filename)
@@ -156,6 +263,11 @@ class Body(object):
             content_type = adjust_content_type(content_type, body, filename)
 
         if content_type.main == 'text':
+            # text is encoded as a whole, so read it right away
+            if self._file:
+                body = self._body = self._file.read()
+                self._file = None
+
             # the text should have a charset
             if not charset:
                 charset = 'utf-8'
@@ -183,20 +295,141 @@ class Body(object):
     def content_type(self):
         return self.headers['Content-Type']
 
+    @property
+    def body(self):
+        if self._file:
+            return self._file.read()
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._file = None
+        self._body = value
+        if self._owner is not None:
+            self._owner._on_change(body=True)
+
+    @property
+    def file(self):
+        """
+        Returns `FileBody` if the body is read from a file when serialized.
+        """
+        return self._file
+
     def headers_changed(self, ignore_prepends=False):
         return True
 
     def body_changed(self):
         return True
 
+    def _headers_changed(self, prepend):
+        if self._owner is not None:
+            self._owner._on_change(prepend=prepend)
+
     def _stream_prepended_headers(self, out):
         self.headers.to_stream(out, prepends_only=True)
 
 
+def is_file_body(body):
+    """
+    Tells whether a body is a file object or a path to be read from.
+    """
+    return hasattr(body, 'read') or hasattr(body, '__fspath__')
+
+
+class FileBody(object):
+    """
+    Body that is kept in a file given by a file object or a path. A file
+    object is read from the position it had when the body was created, and
+    it is left at that position.
+    """
+
+    def __init__(self, file_or_path):
+        if hasattr(file_or_path, 'read'):
+            self._path = None
+            self._file = file_or_path
+            try:
+                self._start = file_or_path.tell()
+            except (IOError, OSError):
+                self._start = None
+        else:
+            self._path = os.fspath(file_or_path)
+            self._file = None
+            self._start = 0
+
+    @contextmanager
+    def open(self):
+        if self._path is not None:
+            with open(self._path, 'rb') as f:
+                yield f
+        elif self._start is None:
+            yield self._file
+        else:
+            # leave the file where it was, so that it could be read again.
+            self._file.seek(self._start)
+            try:
+                yield self._file
+            finally:
+                self._file.seek(self._start)
+
+    def read(self, size=-1):
+        with self.open() as f:
+            data = f.read(size)
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        return data
+
+    def size(self):
+        if self._path is not None:
+            return os.path.getsize(self._path)
+
+        if self._start is None:
+            return 0
+
+        end = self._file.seek(0, os.SEEK_END)
+        if end is None:
+            end = self._file.tell()
+        self._file.seek(self._start)
+        return end - self._start
+
+    def to_stream(self, out):
+        """
+        Writes the file base64 encoded the same way `_email.encode_base64`
+        does it, chunk by chunk.
+        """
+        with self.open() as f:
+            pending = b''
+            while True:
+                chunk = f.read(_BASE64_CHUNK_SIZE)
+                if isinstance(chunk, six.text_type):
+                    chunk = chunk.encode('utf-8')
+
+                data = pending + chunk
+                if chunk:
+                    # hold back the last line, the encoding of the final
+                    # one is special.
+                    size = len(data) - (len(data) % 57 or 57)
+                    data, pending = data[:size], data[size:]
+                    if not data:
+                        continue
+
+                encoded = _email.encode_base64(data)
+                if chunk and not encoded.endswith(b'\n'):
+                    encoded += b'\n'
+
+                if six.PY3:
+                    encoded = encoded.decode('ascii')
+                out.write(encoded)
+
+                if not chunk:
+                    break
+
+
 class Part(object):
 
     def __init__(self, ctype):
+        self._owner = None
         self.headers = headers.MimeHeaders()
+        self.headers._on_change = self._headers_changed
         self.body = None
         self.headers['Content-Type'] = ctype
         self.headers['MIME-Version'] = '1.0'
@@ -212,11 +445,16 @@ class Part(object):
     def body_changed(self):
         return True
 
+    def _headers_changed(self, prepend):
+        if self._owner is not None:
+            self._owner._on_change(prepend=prepend)
+
     def _stream_prepended_headers(self, out):
         self.headers.to_stream(out, prepends_only=True)
 
 
 class RichPartMixin(object):
+    __slots__ = ('_is_root', '_bounce')
 
     def __init__(self, is_root=False):
         self._is_root = is_root
@@ -311,27 +549,62 @@ class RichPartMixin(object):
     def set_root(self, val):
         self._is_root = bool(val)
 
-    def walk(self, with_self=False, skip_enclosed=False):
+    def walk(self, with_self=False, skip_enclosed=False, content_type=None,
+             attachments_only=False, max_depth=None):
         """
         Returns iterator object traversing through the message parts. If the
         top level part needs to be included then set the `with_self` to `True`.
         If the parts of the enclosed messages should not be included then set
         the `skip_enclosed` parameter to `True`.
+
+        Parts can be filtered by `content_type`, e.g. 'text/html' or 'text/*',
+        and by `attachments_only`. The parts of this part are at depth 1, an
+        enclosed message is one level deeper than the part that encloses it,
+        parts deeper than `max_depth` are not traversed.
         """
+        for part, _ in _walk_depths(self, skip_enclosed, max_depth):
+            if part is self and not with_self:
+                continue
+            if content_type and not _match_content_type(part.content_type,
+                                                        content_type):
+                continue
+            if attachments_only and not part.is_attachment():
+                continue
+            yield part
 
-        if with_self:
-            yield self
+    def part_by_path(self, part_path):
+        """
+        Returns the part at an IMAP style path, e.g. '1.2', the way
+        `decode_all` numbers them, or None if there is no such part.
+        """
+        try:
+            numbers = [int(n) for n in part_path.split('.')] if part_path else []
+        except ValueError:
+            return None
 
-        if self.content_type.is_multipart():
-            for p in self.parts:
-                yield p
-                for x in p.walk(with_self=False, skip_enclosed=skip_enclosed):
-                    yield x
+        part, message = self, True
+        i = 0
+        while i < len(numbers):
+            content_type = part.content_type
+            number = numbers[i]
+            if content_type.is_multipart():
+                if not 0 < number <= len(part.parts):
+                    return None
+                part, message = part.parts[number - 1], False
+            elif message:
+                # The body of a message that is not multipart is numbered 1.
+                if number != 1:
+                    return None
+                message = False
+            elif content_type.is_message_container() and part.enclosed:
+                # An enclosed message has the path of its container.
+                part, message = part.enclosed, True
+                continue
+            else:
+                return None
+            i += 1
 
-        elif self.content_type.is_message_container() and not skip_enclosed:
-            yield self.enclosed
-            for p in self.enclosed.walk(with_self=False):
-                yield p
+        return part
 
     def is_attachment(self):
         return self.content_disposition[0] == 'attachment'
@@ -388,26 +661,61 @@ class RichPartMixin(object):
 
 
 class MimePart(RichPartMixin):
+    # Changes are tracked with a flag that is set when the part changes and
+    # propagated up to the root, rather than by checking the whole tree. The
+    # flag is set if the part's headers, other than prepended ones, or body
+    # have changed, or if anything in its parts or enclosed message has.
+    #
+    # The size of the part is cached the same way: it is kept until the
+    # part or anything in it changes, so only the changed parts are measured
+    # again.
+    #
+    # Parts and the enclosed message can be changed directly as well, the
+    # list of parts tells the part about changes.
+    __slots__ = ('_container', '_parts', '_enclosed', '_parent', '_changed',
+                 '_size')
 
     def __init__(self, container, parts=None, enclosed=None, is_root=False):
         RichPartMixin.__init__(self, is_root)
         self._container = container
-        self.parts = parts or []
-        self.enclosed = enclosed
+        self._parts = _Parts(self, parts or ())
+        self._enclosed = enclosed
+        self._parent = None
+        self._size = None
+
+        # Parts that have not been scanned are always serialized anew.
+        self._changed = not isinstance(container, Stream)
+        container._owner = self
+
+        for part in self.parts:
+            self._adopt(part)
+        if enclosed is not None:
+            self._adopt(enclosed)
 
     @property
     def size(self):
-        """ Returns message size in bytes"""
-        if self.is_root() and not self.was_changed():
-            if isinstance(self._container, Stream):
-                return self._container.size
-            else:
-                return sum(part._container.size
-                           for part in self.walk(with_self=True))
-        else:
+        """
+        Returns the size of the serialized message in bytes, text is counted
+        encoded in utf-8. Sizes of parts are cached until the parts change,
+        so after edits only the changed parts are measured again.
+        """
+        if self._size is None and self.is_root() and \
+                not self.was_changed(ignore_prepends=True):
+            # The whole message string is serialized then, see to_string.
             with closing(_CounterIO()) as out:
-                self.to_stream(out)
-                return out.getvalue()
+                self._container._stream_prepended_headers(out)
+                out.write(self._container.string)
+                self._size = out.getvalue()
+            return self._size
+
+        with closing(_CounterIO()) as out:
+            self.to_stream(out)
+            return out.getvalue()
+
+    def set_root(self, val):
+        RichPartMixin.set_root(self, val)
+        # Root messages are measured as a whole, see size.
+        self._size = None
 
     @property
     def headers(self):
@@ -452,6 +760,66 @@ class MimePart(RichPartMixin):
                 or self.content_type.is_delivery_status():
             self._container.body = value
 
+    def open_body(self, chunk_size=_BODY_CHUNK_SIZE):
+        """
+        Returns a binary file object with the body decoded from its transfer
+        encoding, but not from its charset. The body is read from the original
+        message and decoded in chunks of `chunk_size`, so large attachments
+        can be consumed without loading them into memory entirely.
+        """
+        if not (self.content_type.is_singlepart()
+                or self.content_type.is_delivery_status()):
+            return None
+
+        if (not isinstance(self._container, Stream)
+                or self._container.body_changed()):
+            body = self._container.body
+            if isinstance(body, six.text_type):
+                _, body = _encode_charset(self.charset, body)
+            return io.BytesIO(body)
+
+        return self._container.open_body(chunk_size)
+
+    def decode_all(self, executor=None):
+        """
+        Decodes bodies of all singlepart parts of the message from their
+        transfer encodings and charsets. Returns an ordered mapping of part
+        paths to decoded bodies, parts are numbered the way IMAP does it,
+        e.g. '1.2' is the second part of the first part of a multipart
+        message.
+
+        If an executor, e.g. concurrent.futures.ThreadPoolExecutor, is given
+        bodies are decoded on it concurrently. With ProcessPoolExecutor only
+        the encoded bodies are sent to workers, not the message. Decoded
+        bodies are kept, so `body` of the parts does not decode them again.
+        """
+        bodies = OrderedDict()
+        pending = []
+        for part_path, part in _walk_paths(self):
+            if not part.content_type.is_singlepart():
+                continue
+
+            container = part._container
+            if isinstance(container, Stream) and container._body is None:
+                bodies[part_path] = None
+                pending.append((part_path, container))
+            else:
+                bodies[part_path] = part.body
+
+        if pending:
+            containers = [container for _, container in pending]
+            args = ([c.content_type for c in containers],
+                    [c.headers.get('Content-Transfer-Encoding', CTE).value
+                     for c in containers],
+                    [c.read_body() for c in containers])
+            decoded = (executor.map(_decode_body, *args) if executor
+                       else map(_decode_body, *args))
+            for (part_path, container), body in zip(pending, decoded):
+                container._body = body
+                bodies[part_path] = body
+
+        return bodies
+
     @property
     def charset(self):
         return self.content_type.get_charset()
@@ -474,21 +842,35 @@ class MimePart(RichPartMixin):
         # we submit the original string,
         # no copying, no alternation, yeah!
         if self.is_root() and not self.was_changed(ignore_prepends=True):
-            with closing(StringIO()) as out:
-                self._container._stream_prepended_headers(out)
-                return out.getvalue() + self._container.string
+            with closing(self._output_buffer()) as out:
+                self._container._stream_prepended_headers(_writer(out))
+                # The entire string goes out, the root part can end before
+                # trailing lines. It is sliced, for it can be memory mapped.
+                return out.getvalue() + self._container.string[:]
         else:
-            with closing(StringIO()) as out:
+            with closing(self._output_buffer()) as out:
                 self.to_stream(out)
                 return out.getvalue()
 
     def to_stream(self, out):
         """
-        Serializes the message using a file like object.
+        Serializes the message using a file like object. Binary file objects
+        get the message encoded in utf-8, unchanged regions of a message
+        scanned as binary are written to them as memoryview slices of the
+        original message, so that they are not copied.
         """
+        out = _writer(out)
+        counting = isinstance(out, _CounterIO)
+        if counting:
+            if self._size is not None:
+                out.write_size(self._size)
+                return
+            start, cacheable = out.tell(), out.cacheable
+            out.cacheable = True
+
         if not self.was_changed(ignore_prepends=True):
             self._container._stream_prepended_headers(out)
-            out.write(self._container.read_message())
+            out.write(self._container.message_view())
         else:
             try:
                 original_position = out.tell()
@@ -497,32 +879,138 @@ class MimePart(RichPartMixin):
                 out.seek(original_position)
                 out.write(self._container.read_message())
 
+        if counting:
+            if out.cacheable:
+                self._size = out.tell() - start
+            out.cacheable = cacheable and out.cacheable
+
     def was_changed(self, ignore_prepends=False):
-        if self._container.headers_changed(ignore_prepends):
+        if self._changed:
             return True
 
-        if self.content_type.is_singlepart():
-            if self._container.body_changed():
-                return True
-            return False
-
-        elif self.content_type.is_multipart():
-            return any(p.was_changed() for p in self.parts)
-
-        elif self.content_type.is_message_container():
-            return self.enclosed.was_changed()
+        return (not ignore_prepends
+                and self._container.headers_changed(ignore_prepends))
 
     def to_python_message(self):
         return _email.message_from_string(self.to_string())
 
+    def _output_buffer(self):
+        """
+        Messages scanned as binary are serialized to bytes, all others to
+        text.
+        """
+        if six.PY3 and isinstance(self._container, Stream):
+            if not isinstance(self._container.string, six.text_type):
+                return six.BytesIO()
+
+        return StringIO()
+
+    @property
+    def parts(self):
+        return self._parts
+
+    @parts.setter
+    def parts(self, parts):
+        before = list(self._parts)
+        self._parts = _Parts(self, parts)
+        self._parts_changed(before)
+
+    @property
+    def enclosed(self):
+        return self._enclosed
+
+    @enclosed.setter
+    def enclosed(self, message):
+        enclosed = self._enclosed
+        if enclosed is not None and enclosed._parent is self:
+            enclosed._parent = None
+        self._enclosed = message
+        if message is not None:
+            message._parent = self
+        # The original message does not have the new enclosed message.
+        self._child_changed()
+        self._size_changed()
+
     def append(self, *messages):
         for m in messages:
-            self.parts.append(m)
             m.set_root(False)
+        self.parts.extend(messages)
 
     def enclose(self, message):
-        self.enclosed = message
         message.set_root(False)
+        self.enclosed = message
+
+    def _parts_changed(self, before):
+        """
+        Called by the list of parts when it changes, `before` are the parts
+        it had.
+        """
+        current = set(id(part) for part in self._parts)
+        for part in before:
+            if id(part) not in current and part._parent is self:
+                part._parent = None
+        for part in self._parts:
+            part._parent = self
+        # The original message does not have the new parts.
+        self._child_changed()
+        self._size_changed()
+
+    def _adopt(self, part):
+        part._parent = self
+        if part.was_changed():
+            self._child_changed()
+
+    def _on_change(self, prepend=False, body=False):
+        """
+        Called by the container when its headers or body change.
+        """
+        if body and not self.content_type.is_singlepart():
+            return
+
+        self._size_changed()
+
+        if prepend:
+            # Prepended headers of the part itself are not its change, but
+            # they are a change of the parts above.
+            if self._parent is not None:
+                self._parent._child_changed()
+        else:
+            self._mark_changed()
+
+    def _child_changed(self):
+        # Only parts and enclosed messages are serialized with a part.
+        content_type = self.content_type
+        if content_type.is_multipart() or content_type.is_message_container():
+            self._mark_changed()
+
+    def _mark_changed(self):
+        part = self
+        while not part._changed:
+            part._changed = True
+            part = part._parent
+            if part is None or not (part.content_type.is_multipart() or
+                                    part.content_type.is_message_container()):
+                break
+
+    def _size_changed(self):
+        part = self
+        while part is not None:
+            part._size = None
+            part = part._parent
+
+    def _set_content_encoding(self, encoding):
+        # Headers are set only when they differ, so serializing a part does
+        # not count as its change.
+        encoding = WithParams(encoding)
+        if self.headers.getraw('Content-Transfer-Encoding') != encoding:
+            self.content_encoding = encoding
+
+    def _set_charset(self, charset):
+        charset = charset.lower()
+        header = self.headers.getraw('Content-Type')
+        if (self.content_type.params.get('charset') != charset
+                or header is None or header.params.get('charset') != charset):
+            self.charset = charset
 
     def _to_stream_when_changed(self, out):
 
@@ -530,13 +1018,20 @@ class MimePart(RichPartMixin):
 
         if ctype.is_singlepart():
 
-            if self._container.body_changed():
+            file_body = getattr(self._container, 'file', None)
+            if file_body:
+                self._set_content_encoding('base64')
+                body = file_body
+                # The file may change, so its size is not cached.
+                if isinstance(out, _CounterIO):
+                    out.cacheable = False
+            elif self._container.body_changed():
                 charset, encoding, body = _encode_body(self)
                 if charset:
-                    self.charset = charset
-                self.content_encoding = WithParams(encoding)
+                    self._set_charset(charset)
+                self._set_content_encoding(encoding)
             else:
-                body = self._container.read_body()
+                body = self._container.body_view()
 
             # RFC allows subparts without headers
             if self.headers:
@@ -545,7 +1040,10 @@ class MimePart(RichPartMixin):
                 raise EncodingError('Root message should have headers')
 
             out.write(_CRLF)
-            out.write(body)
+            if file_body:
+                file_body.to_stream(out)
+            else:
+                out.write(body)
         else:
             self.headers.to_stream(out)
             out.write(_CRLF)
@@ -562,6 +1060,99 @@ class MimePart(RichPartMixin):
                 self.enclosed.to_stream(out)
 
 
+class _Parts(list):
+    """
+    Parts of a multipart message, changing the list changes the message.
+    """
+    __slots__ = ('_owner',)
+
+    def __init__(self, owner, parts=()):
+        list.__init__(self, parts)
+        self._owner = owner
+
+
+def _notifying(name):
+    method = getattr(list, name)
+
+    def mutate(self, *args):
+        before = list(self)
+        result = method(self, *args)
+        # An unpickled list is filled before it has an owner.
+        owner = getattr(self, '_owner', None)
+        if owner is not None:
+            owner._parts_changed(before)
+        return result
+
+    mutate.__name__ = name
+    return mutate
+
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear',
+              'sort', 'reverse', '__setitem__', '__delitem__', '__iadd__',
+              '__imul__', '__setslice__', '__delslice__'):
+    if hasattr(list, _name):
+        setattr(_Parts, _name, _notifying(_name))
+
+
+def _walk_depths(part, skip_enclosed=False, max_depth=None):
+    """
+    Yields the part and all parts below it in preorder along with their
+    depths. The tree is traversed with a stack rather than recursion, so
+    deeply nested messages do not hit the recursion limit.
+    """
+    stack = [(part, 0)]
+    while stack:
+        part, depth = stack.pop()
+        yield part, depth
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+
+        content_type = part.content_type
+        if content_type.is_multipart():
+            stack.extend((p, depth + 1) for p in reversed(part.parts))
+        elif (content_type.is_message_container() and not skip_enclosed
+                and part.enclosed is not None):
+            stack.append((part.enclosed, depth + 1))
+
+
+def _walk_paths(part):
+    """
+    Same as walk(with_self=True), but yields parts along with their IMAP
+    paths. A message that is not multipart has its body numbered 1, and an
+    enclosed message has the path of the part that encloses it.
+    """
+    stack = [(part, '', True)]
+    while stack:
+        part, part_path, message = stack.pop()
+        content_type = part.content_type
+        if message and not content_type.is_multipart():
+            part_path = _join_path(part_path, 1)
+
+        yield part_path, part
+
+        if content_type.is_multipart():
+            stack.extend((p, _join_path(part_path, number), False)
+                         for number, p in reversed(list(enumerate(part.parts,
+                                                                  1))))
+        elif (content_type.is_message_container()
+                and part.enclosed is not None):
+            stack.append((part.enclosed, part_path, True))
+
+
+def _match_content_type(content_type, pattern):
+    pattern = pattern.lower()
+    if pattern.endswith('/*'):
+        return content_type.main == pattern[:-2]
+    return content_type.value == pattern
+
+
+def _join_path(part_path, number):
+    if part_path:
+        return '{0}.{1}'.format(part_path, number)
+    return str(number)
+
+
 def _decode_body(content_type, content_encoding, body):
     # decode the transfer encoding
     body = _decode_transfer_encoding(content_encoding, body)
@@ -798,20 +1389,76 @@ def _base64_decode(s):
             return base64.b64decode(s[:-1])
 
         # add padding
-        return base64.b64decode(s + '=' * (4 - tail_size))
+        padding = '=' * (4 - tail_size)
+        if isinstance(s, six.binary_type):
+            padding = padding.encode('ascii')
+        return base64.b64decode(s + padding)
+
+
+def _writer(out):
+    if six.PY2 or isinstance(out, (_Writer, _CounterIO)):
+        return out
+
+    return _Writer(out, isinstance(out, (io.RawIOBase, io.BufferedIOBase)))
+
+
+class _Writer(object):
+    """
+    Wraps an output file object and converts everything written to it to
+    the type it expects. A message tree may contain both text and raw bytes
+    of messages scanned as binary, so it cannot be written as is.
+    """
+
+    def __init__(self, out, binary):
+        self._out = out
+        self._binary = binary
+
+    def tell(self):
+        return self._out.tell()
+
+    def seek(self, p):
+        return self._out.seek(p)
+
+    def write(self, s):
+        if self._binary:
+            if isinstance(s, six.text_type):
+                s = s.encode('utf-8')
+        elif not isinstance(s, six.text_type):
+            if isinstance(s, memoryview):
+                s = s.tobytes()
+            s = to_unicode(s)
+
+        self._out.write(s)
+
+
+def _is_ascii(s):
+    # str.isascii does not scan the string, it only checks how it is stored.
+    if hasattr(s, 'isascii'):
+        return s.isascii()
+    return is_pure_ascii(s)
 
 
 class _CounterIO(object):
+    """
+    Counts bytes of the message written to it, text is counted encoded in
+    utf-8. Parts tell it whether what they wrote can be cached.
+    """
 
     def __init__(self):
         self.length = 0
+        self.cacheable = True
 
     def tell(self):
         return self.length
 
     def write(self, s):
+        if isinstance(s, six.text_type) and not _is_ascii(s):
+            s = s.encode('utf-8')
         self.length += len(s)
 
+    def write_size(self, size):
+        self.length += size
+
     def seek(self, p):
         self.length = p
 
@@ -822,6 +1469,157 @@ class _CounterIO(object):
         pass
 
 
+class _LineReader(object):
+    """
+    Reads lines of a message string from a position, the way a file object
+    over the message would, but with a position of its own.
+    """
+    __slots__ = ('_string', '_position', '_lf')
+
+    def __init__(self, string, position):
+        self._string = string
+        self._position = position
+        self._lf = '\n' if isinstance(string, six.text_type) else b'\n'
+
+    def readline(self):
+        end = self._string.find(self._lf, self._position)
+        end = len(self._string) if end < 0 else end + 1
+        line = self._string[self._position:end]
+        self._position = end
+        return line
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position):
+        self._position = position
+
+
+class _BodyReader(io.RawIOBase):
+    """
+    Reads a range of a message and decodes its transfer encoding on the fly.
+    """
+
+    def __init__(self, string, start, end, encoding, chunk_size):
+        self._string = string
+        self._position = start
+        self._end = end
+        self._chunk_size = chunk_size
+        self._decoder = _BODY_DECODERS.get(encoding, _IdentityDecoder)()
+        self._decoded = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._decoded and self._position < self._end:
+            chunk_end = min(self._position + self._chunk_size, self._end)
+            chunk = self._string[self._position:chunk_end]
+            if isinstance(chunk, six.text_type):
+                chunk = chunk.encode('utf-8')
+
+            self._position = chunk_end
+            self._decoded = self._decoder.decode(
+                chunk, final=chunk_end == self._end)
+
+        size = min(len(b), len(self._decoded))
+        b[:size] = self._decoded[:size]
+        self._decoded = self._decoded[size:]
+        return size
+
+
+class _IdentityDecoder(object):
+
+    def decode(self, data, final):
+        return data
+
+
+class _Base64Decoder(object):
+    """
+    Decodes base64 in chunks the same way `_base64_decode` decodes it at
+    once: characters out of the base64 alphabet are skipped, padding counts
+    only where it completes a 4-character quantum and ends the data there,
+    and broken data at the end is cropped or padded.
+    """
+
+    def __init__(self):
+        # Base64 characters of a quantum that is not complete yet.
+        self._tail = b''
+        # Padding characters seen in the current quantum.
+        self._pads = 0
+        self._done = False
+
+    def decode(self, data, final):
+        if self._done:
+            return b''
+
+        data = data.translate(None, _b64_invalid_bytes_but_pad)
+        pieces = [self._tail]
+        size = len(self._tail)
+        position = 0
+        while True:
+            pad = data.find(b'=', position)
+            if pad < 0:
+                if position < len(data):
+                    pieces.append(data[position:])
+                    self._pads = 0
+                break
+
+            if pad > position:
+                pieces.append(data[position:pad])
+                size += pad - position
+                self._pads = 0
+            quantum_size = size & 3
+            if quantum_size >= 2:
+                self._pads += 1
+                if quantum_size + self._pads >= 4:
+                    self._done = True
+                    break
+            position = pad + 1
+
+        data = b''.join(pieces)
+        if final or self._done:
+            self._tail = b''
+            tail_size = len(data) & 3
+            if tail_size == 1:
+                data = data[:-1]
+            elif tail_size:
+                data += b'=' * (4 - tail_size)
+        else:
+            complete = len(data) & ~3
+            self._tail = data[complete:]
+            data = data[:complete]
+
+        return base64.b64decode(data)
+
+
+class _QuotedPrintableDecoder(object):
+    """
+    Decodes quoted-printable in chunks. Soft line breaks only join adjacent
+    lines, so complete lines can be decoded independently of each other.
+    """
+
+    def __init__(self):
+        self._tail = b''
+
+    def decode(self, data, final):
+        data = self._tail + data
+        if final:
+            self._tail = b''
+        else:
+            complete = data.rfind(b'\n') + 1
+            self._tail = data[complete:]
+            data = data[:complete]
+
+        return quopri.decodestring(data)
+
+
+_BODY_DECODERS = {
+    'base64': _Base64Decoder,
+    'quoted-printable': _QuotedPrintableDecoder,
+}
+
+
 _CRLF = '\r\n'
 
 
@@ -832,11 +1630,21 @@ for ch in range(256):
     if chr(ch) not in _b64_alphabet:
         _b64_invalid_chars += chr(ch)
 
+_b64_invalid_bytes = _b64_invalid_chars
+if six.PY3:
+    _b64_invalid_bytes = _b64_invalid_chars.encode('latin-1')
+
+# The stream decoder keeps padding to see where the data ends.
+_b64_invalid_bytes_but_pad = _b64_invalid_bytes.replace(b'=', b'')
+
 
 def _recover_base64(s):
     if six.PY2:
         return s.translate(None, _b64_invalid_chars)
 
+    if isinstance(s, six.binary_type):
+        return s.translate(None, _b64_invalid_bytes)
+
     buf = StringIO()
     chunk_start = 0
     for i, c in enumerate(s):
@@ -1,3 +1,4 @@
+import mmap
 from collections import deque
 from logging import getLogger
 
@@ -6,28 +7,135 @@ import six
 from six.moves import StringIO
 
 from flanker.mime.message.errors import DecodingError
-from flanker.mime.message.headers import parsing, is_empty, ContentType
+from flanker.mime.message.headers import (parsing, is_empty, ContentType,
+                                          MimeHeaders)
 from flanker.mime.message.part import MimePart, Stream
 from flanker.mime.message.utils import to_unicode
 
 log = getLogger(__name__)
 
 
-def scan(string):
+def scan(string, keep_bytes=False):
     """Scanner that uses 1 pass to scan the entire message and
-    build a message tree"""
+    build a message tree.
 
+    In Python 3 binary input is decoded to text before scanning, unless
+    `keep_bytes` is set. In that case the message is scanned as is, headers
+    and text bodies are decoded only when accessed, and the message is
+    serialized back to bytes.
+
+    A memory mapped file can be scanned as well, it is treated as binary.
+    """
+
+    string = _prepare(string, keep_bytes)
+    return _build_tree(tokenize(string), string)
+
+
+def scan_headers(string, keep_bytes=False):
+    """
+    Scans only the top-level headers of a message, that is everything up to
+    the first empty line, so the cost does not depend on the message size.
+    Input is treated the same way `scan` does it.
+
+    Returns `HeaderBlock` that can be turned into the message tree later.
+    """
+    # Only the header block is decoded here, the rest of the message is
+    # decoded when it is needed.
+    string = _prepare(string, True)
+    # A memory mapped message is scanned as binary, the way `scan` does it.
+    if isinstance(string, mmap.mmap):
+        keep_bytes = True
+    end = _locate_header_block_end(string)
+    head = _prepare(string[:end], keep_bytes)
+
+    stream = _open_stream(head)
+    headers = MimeHeaders.from_stream(stream)
+    body_start = stream.tell()
+
+    tokens_filter = _TokensFilter()
+    tokens = []
+    _tokenize(head, tokens_filter, tokens, 0, len(head))
+    return HeaderBlock(string, headers, body_start, tokens_filter, tokens,
+                       end, keep_bytes, head)
+
+
+class HeaderBlock(object):
+    """
+    Top-level headers of a message scanned by `scan_headers`.
+    """
+
+    def __init__(self, string, headers, body_start, tokens_filter, tokens,
+                 scanned, keep_bytes=False, head=None):
+        self._string = string
+        self._keep_bytes = keep_bytes
+        self._head = head
+        self.headers = headers
+        self.body_start = body_start
+        self._tokens_filter = tokens_filter
+        self._tokens = tokens
+        self._scanned = scanned
+
+    @property
+    def string(self):
+        """
+        The entire message, decoded the same way `scan` decodes it.
+        """
+        string = _prepare(self._string, self._keep_bytes)
+        if string is not self._string:
+            # The header block has been decoded on its own, the scanned
+            # tokens and headers are only valid if the message starts with
+            # it.
+            head = self._head
+            if string[:len(head)] != head:
+                string = head + _prepare(self._string[self._scanned:], False)
+            self._string = string
+            self._scanned = len(head)
+            self._head = None
+        return string
+
+    def to_message(self):
+        """
+        Scans the rest of the message and returns the message tree. The
+        headers are not scanned again, the message gets this very `headers`
+        object.
+        """
+        string = self.string
+        tokens = list(self._tokens)
+        _tokenize(string, self._tokens_filter.copy(), tokens, self._scanned,
+                  len(string))
+        message = _build_tree(tokens, string)
+        message._container._set_headers(self.headers, self.body_start)
+        return message
+
+
+def _prepare(string, keep_bytes):
     if six.PY2:
-        if not isinstance(string, six.binary_type):
+        if not isinstance(string, (six.binary_type, mmap.mmap)):
             raise DecodingError('Scanner works with binary only')
     else:
-        if isinstance(string, six.binary_type):
+        if isinstance(string, six.binary_type) and not keep_bytes:
             string = to_unicode(string)
 
-        if not isinstance(string, six.text_type):
+        if not isinstance(string, (six.text_type, six.binary_type,
+                                   mmap.mmap)):
             raise DecodingError('Cannot scan type %s' % type(string))
 
-    tokens = tokenize(string)
+    return string
+
+
+def _locate_header_block_end(string):
+    """
+    Returns the position right after the first empty line of a message, or
+    the message length if there is none.
+    """
+    if isinstance(string, six.text_type):
+        match = _RE_EMPTY_LINE.search(string)
+    else:
+        match = _RE_EMPTY_LINE_BYTES.search(string)
+    return match.end() if match else len(string)
+
+
+def _build_tree(tokens, string):
     if not tokens:
         tokens = [default_content_type()]
     try:
@@ -38,6 +146,89 @@ def scan(string):
         raise six.raise_from(DecodingError("Malformed MIME message"), cause)
 
 
+class FeedScanner(object):
+    """
+    Push based scanner for messages that arrive in chunks, e.g. during the
+    SMTP DATA phase. Chunks are tokenized as they are fed, so header errors
+    and size limit violations are reported before the message is complete:
+
+        >>> scanner = FeedScanner(max_size=25 * 1024 * 1024)
+        >>> for chunk in chunks:
+        ...     scanner.feed(chunk)
+        >>> message = scanner.close()
+
+    The resulting message tree is the same that `scan` builds for the whole
+    message. Binary chunks are scanned the way `scan` does it when
+    `keep_bytes` is set.
+    """
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._chunks = []
+        self._size = 0
+        # Message data that has not been tokenized yet, it starts at the
+        # `_scanned` offset, and up to three characters that precede it, so
+        # newlines around boundaries are grabbed the way `tokenize` does.
+        self._tail = None
+        self._before = None
+        self._scanned = 0
+        self._filter = _TokensFilter()
+        self._tokens = []
+
+    def feed(self, chunk):
+        if self._tail is None:
+            if not isinstance(chunk, (six.text_type, six.binary_type)):
+                raise DecodingError('Cannot scan type %s' % type(chunk))
+            self._tail = self._before = chunk[:0]
+
+        if type(chunk) is not type(self._tail):
+            raise DecodingError('Cannot mix %s and %s chunks' %
+                                (type(chunk), type(self._tail)))
+
+        self._size += len(chunk)
+        if self._max_size is not None and self._size > self._max_size:
+            raise DecodingError(
+                'Message is too big: {0}, max is {1}'.format(
+                    self._size, self._max_size))
+
+        self._chunks.append(chunk)
+        self._tail += chunk
+
+        # Only complete lines can be tokenized.
+        if isinstance(chunk, six.text_type):
+            complete = self._tail.rfind('\n') + 1
+        else:
+            complete = self._tail.rfind(b'\n') + 1
+        if complete:
+            self._tokenize(complete)
+
+    def close(self):
+        """
+        Completes scanning and returns the message tree.
+        """
+        if self._tail is None:
+            return scan('' if six.PY3 else b'')
+
+        if self._tail:
+            self._tokenize(len(self._tail), final=True)
+
+        string = self._tail[:0].join(self._chunks)
+        self._chunks = []
+        return _build_tree(self._tokens, string)
+
+    def _tokenize(self, size, final=False):
+        string = self._before + self._tail
+        offset = self._scanned - len(self._before)
+        start = len(self._before)
+        # A content type header on the last line can be folded, so it is
+        # tokenized when the next line arrives.
+        end = _tokenize(string, self._filter, self._tokens, start,
+                        start + size, offset, final)
+        self._before = string[max(0, end - 3):end]
+        self._tail = string[end:]
+        self._scanned = offset + end
+
+
 def traverse(pointer, iterator, parent=None, allow_bad_mime=False):
     """Recursive-descendant parser"""
 
@@ -234,7 +425,6 @@ def make_part(content_type, start, end, iterator, parts=[], enclosed=None,
             content_type=content_type,
             start=start,
             end=end,
-            stream=iterator.stream,
             string=iterator.string),
         parts=parts,
         enclosed=enclosed,
@@ -244,7 +434,10 @@ def make_part(content_type, start, end, iterator, parts=[], enclosed=None,
 def locate_first_newline(stream, start):
     """We need to locate the first newline"""
     stream.seek(start)
-    for line in stream:
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
         if is_empty(line):
             return stream.tell()
 
@@ -255,7 +448,7 @@ class TokensIterator(object):
         self.position = -1
         self.tokens = tokens
         self.string = string
-        self.stream = StringIO(string)
+        self.stream = _open_stream(string)
         self.opcount = 0
 
     def next(self):
@@ -284,7 +477,20 @@ class TokensIterator(object):
                     self.opcount, _MAX_OPS))
 
 
+def _open_stream(string):
+    # memory mapped file is a file like object itself.
+    if isinstance(string, mmap.mmap):
+        return string
+
+    if six.PY3 and isinstance(string, six.binary_type):
+        return six.BytesIO(string)
+
+    return StringIO(string)
+
+
 class Boundary(object):
+    __slots__ = ('value', 'start', 'end', 'final')
+
     def __init__(self, value, start, end, final=None):
         self.value = value
         self.start = start
@@ -321,6 +527,8 @@ class Boundary(object):
 
 
 class End(object):
+    __slots__ = ()
+
     def is_end(self):
         return True
 
@@ -340,6 +548,8 @@ class End(object):
 
 
 class Start(object):
+    __slots__ = ()
+
     def is_end(self):
         return False
 
@@ -355,8 +565,7 @@ class Start(object):
         return False
 
 
-_RE_TOKENIZER = re.compile(
-    r"""
+_TOKENIZER_PATTERN = r"""
     (?P<ctype>
         # Note that a content type match corresponds to a Content-Type header
         # only when it is located between a boundary and an empty line.
@@ -381,8 +590,18 @@ _RE_TOKENIZER = re.compile(
         # and its body.
         ^(\r\n|\n)
     )
-    """,
-    re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+    """
+
+_RE_TOKENIZER = re.compile(
+    _TOKENIZER_PATTERN, re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+
+# In Python 3 the tokenizer needs a separate pattern to scan binary messages.
+if six.PY3:
+    _RE_TOKENIZER_BINARY = re.compile(
+        _TOKENIZER_PATTERN.encode('ascii'),
+        re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+else:
+    _RE_TOKENIZER_BINARY = _RE_TOKENIZER
 
 
 _CTYPE = 'ctype'
@@ -399,27 +618,84 @@ _SECTION_BODY = 'body'
 _DEFAULT_CONTENT_TYPE = ContentType('text', 'plain', {'charset': 'us-ascii'})
 _EMPTY_LINE = '\r\n'
 
+# The first empty line, the message can start with one as well.
+_RE_EMPTY_LINE = re.compile(u'\\A\\r?\\n|\\n\\r?\\n')
+_RE_EMPTY_LINE_BYTES = re.compile(b'\\A\\r?\\n|\\n\\r?\\n')
+
 
 def tokenize(string):
     """
     Scans the entire message to find all Content-Types and boundaries.
+
+    Only headers sections are scanned line by line. Everywhere else, that is
+    in bodies, multipart preambles and epilogues, boundaries are the only
+    tokens that matter, so the scanner jumps from one line that starts with
+    `--` to another.
+
+    Binary messages are scanned without decoding, token positions are offsets
+    in bytes then.
     """
-    if six.PY3 and isinstance(string, six.binary_type):
-        string = string.decode('utf-8')
-
-    tokens = deque()
-    for m in _RE_TOKENIZER.finditer(string):
-        if m.group(_CTYPE):
-            name, token = parsing.parse_header(m.group(_CTYPE))
-        elif m.group(_BOUNDARY):
-            token = Boundary(m.group(_BOUNDARY).strip('\t\r\n'),
-                             _grab_newline(m.start(), string, -1),
-                             _grab_newline(m.end(), string, 1))
+    tokens = []
+    _tokenize(string, _TokensFilter(), tokens, 0, len(string))
+    return tokens
+
+
+def _tokenize(string, tokens_filter, tokens, position, end, offset=0,
+              final=True):
+    """
+    Scans the message from `position` up to `end`, that must be a start of a
+    line, and appends true tokens found there to `tokens`. The string can be
+    a part of the message that starts at the given offset.
+
+    Unless the string is `final`, a content type header on its last line is
+    left alone, for it can be folded onto the lines that follow. Returns the
+    position the string has been scanned up to.
+    """
+    tokenizer = _tokenizer_for(string)
+    dashes = '\n--' if isinstance(string, six.text_type) else b'\n--'
+    while True:
+        if tokens_filter.current_section == _SECTION_HEADERS:
+            m = tokenizer.search(string, position, end)
         else:
-            token = _EMPTY_LINE
+            # Start from the preceding character to see if the current line
+            # starts with dashes as well.
+            position = string.find(dashes, max(position - 1, 0), end)
+            m = position >= 0 and tokenizer.match(string, position + 1, end)
+
+        if not m:
+            return end
+
+        if not final and m.group(_CTYPE) and end - m.end() <= 2:
+            return m.start()
+
+        position = m.end()
+        token = tokens_filter.push(_make_token(m, string, offset))
+        if token is not None:
+            tokens.append(token)
+
 
-        tokens.append(token)
-    return _filter_false_tokens(tokens)
+def _tokenizer_for(string):
+    if isinstance(string, six.text_type):
+        return _RE_TOKENIZER
+
+    return _RE_TOKENIZER_BINARY
+
+
+def _make_token(m, string, offset=0):
+    """
+    Makes a token out of a tokenizer match found in a string that starts at
+    the given offset of the message.
+    """
+    if m.group(_CTYPE):
+        name, token = parsing.parse_header(_to_text(m.group(_CTYPE)))
+    elif m.group(_BOUNDARY):
+        token = Boundary(_to_text(m.group(_BOUNDARY)).strip('\t\r\n'),
+                         offset + _grab_newline(m.start(), string, -1),
+                         offset + _grab_newline(m.end(), string, 1))
+    else:
+        token = _EMPTY_LINE
+
+    return token
 
 
 def _grab_newline(position, string, direction):
@@ -427,20 +703,36 @@ def _grab_newline(position, string, direction):
     Boundary can be preceded by `\r\n` or `\n` and can end with `\r\n` or `\n`
     this function scans the line to locate these cases.
     """
+    if isinstance(string, six.text_type):
+        cr, lf = '\r', '\n'
+    else:
+        cr, lf = b'\r', b'\n'
+
     while 0 < position < len(string):
-        if string[position] == '\n':
+        if string[position:position+1] == lf:
             if direction < 0:
-                if position - 1 > 0 and string[position-1] == '\r':
+                if position - 1 > 0 and string[position-1:position] == cr:
                     return position - 1
             return position
         position += direction
     return position
 
 
-def _filter_false_tokens(tokens):
+def _to_text(value):
     """
-    Traverses a list of pre-scanned tokens and removes false content-type
-    and boundary tokens.
+    Tokens pre-scanned in a binary message are decoded to text, so they could
+    be compared with the values of parsed headers.
+    """
+    if six.PY3 and isinstance(value, six.binary_type):
+        return to_unicode(value)
+
+    return value
+
+
+class _TokensFilter(object):
+    """
+    Tells false content-type and boundary tokens from true ones, given
+    pre-scanned tokens one by one in the order they appear in a message.
 
     A content-type header is false unless it it the first content-type header
     in a message/part headers section.
@@ -448,62 +740,73 @@ def _filter_false_tokens(tokens):
     A boundary token is false if it has not been mentioned in a preceding
     content-type header.
     """
-    current_section = _SECTION_HEADERS
-    current_content_type = None
-    filtered = []
-    boundaries = []
-    for token in tokens:
+
+    def __init__(self):
+        self.current_section = _SECTION_HEADERS
+        self.current_content_type = None
+        self.boundaries = []
+
+    def copy(self):
+        tokens_filter = _TokensFilter()
+        tokens_filter.current_section = self.current_section
+        tokens_filter.current_content_type = self.current_content_type
+        tokens_filter.boundaries = list(self.boundaries)
+        return tokens_filter
+
+    def push(self, token):
+        """
+        Returns the token if it is true, or None if it should be dropped.
+        """
         if isinstance(token, ContentType):
             # Only the first content-type header in a headers section is valid.
-            if current_content_type or current_section != _SECTION_HEADERS:
-                continue
-    
-            current_content_type = token
-            boundaries.append(token.get_boundary())
+            if (self.current_content_type or
+                    self.current_section != _SECTION_HEADERS):
+                return None
+
+            self.current_content_type = token
+            self.boundaries.append(token.get_boundary())
 
         elif isinstance(token, Boundary):
             value = token.value[2:]
 
-            if value in boundaries:
+            if value in self.boundaries:
                 token.value = value
                 token.final = False
-                current_section = _SECTION_HEADERS
-                current_content_type = None
+                self.current_section = _SECTION_HEADERS
+                self.current_content_type = None
 
-            elif _strip_endings(value) in boundaries:
+            elif _strip_endings(value) in self.boundaries:
                 token.value = _strip_endings(value)
                 token.final = True
-                current_section = _SECTION_MULTIPART_EPILOGUE
+                self.current_section = _SECTION_MULTIPART_EPILOGUE
 
             else:
                 # False boundary detected!
-                continue
+                return None
 
         elif token == _EMPTY_LINE:
-            if current_section == _SECTION_HEADERS:
-                if not current_content_type:
-                    current_content_type = _DEFAULT_CONTENT_TYPE
-
-                if current_content_type.is_singlepart():
-                    current_section = _SECTION_BODY
-                elif current_content_type.is_multipart():
-                    current_section = _SECTION_MULTIPART_PREAMBLE
+            if self.current_section == _SECTION_HEADERS:
+                if not self.current_content_type:
+                    self.current_content_type = _DEFAULT_CONTENT_TYPE
+
+                if self.current_content_type.is_singlepart():
+                    self.current_section = _SECTION_BODY
+                elif self.current_content_type.is_multipart():
+                    self.current_section = _SECTION_MULTIPART_PREAMBLE
                 else:
                     # Start of an enclosed message or just its headers.
-                    current_section = _SECTION_HEADERS
-                    current_content_type = None
+                    self.current_section = _SECTION_HEADERS
+                    self.current_content_type = None
 
             # Cast away empty line tokens, for they have been pre-scanned just
             # to identify a place where a header section completes and a body
             # section starts.
-            continue
+            return None
 
         else:
             raise DecodingError('Unknown token')
 
-        filtered.append(token)
-
-    return filtered
+        return token
 
 
 def _strip_endings(value):
@@ -72,6 +72,8 @@ def introduces_loop(parent, child):
 
 
 class Container(object):
+    __slots__ = ('message', 'parent', 'child', 'next', 'prev')
+
     def __init__(self, message=None):
         self.message = message
         self.parent = None
@@ -41,8 +41,7 @@ setup(name='flanker',
           'regex>=0.1.20110315',
           'six',
           'standard-imghdr==3.13.0',
-          'tld',
-          'WebOb>=0.9.8'],
+          'tld'],
       extras_require={
           'validator': [
               'dnsq>=1.1.6',
@@ -0,0 +1,154 @@
+# coding:utf-8
+
+import six
+from mock import patch
+from nose.plugins.skip import SkipTest
+from nose.tools import assert_equal
+
+from flanker.addresslib import address
+
+if six.PY3:
+    import asyncio
+    from flanker.addresslib import aio
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _resolved(value, delay=0):
+    future = asyncio.get_event_loop().create_future()
+    asyncio.get_event_loop().call_later(delay, future.set_result, value)
+    return future
+
+
+class _FakeDNSLookup(object):
+
+    def __init__(self, records):
+        self.records = records
+        self.lookups = []
+
+    def lookup(self, fqdn):
+        self.lookups.append(fqdn)
+        return _resolved(self.records.get(fqdn, []))
+
+
+class _FakeMxCache(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, domain):
+        return _resolved(self.values.get(domain))
+
+    def set(self, domain, value):
+        self.values[domain] = value
+        return _resolved(None)
+
+
+class _FakeProbe(object):
+    """Hosts connect after their delay, or fail if the delay is None."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.probed = []
+
+    def __call__(self, host, timeout):
+        self.probed.append(host)
+        delay = self.delays.get(host)
+        if delay is None:
+            return _resolved(False)
+        return _resolved(True, delay)
+
+
+def _setup_drivers(records, delays):
+    dns_lookup = _FakeDNSLookup(records)
+    mx_cache = _FakeMxCache()
+    aio.set_async_dns_lookup(dns_lookup)
+    aio.set_async_mx_cache(mx_cache)
+    return dns_lookup, mx_cache, _FakeProbe(delays)
+
+
+def _teardown_drivers():
+    aio.set_async_dns_lookup(None)
+    aio.set_async_mx_cache(None)
+
+
+def test_connect_to_mail_exchanger_async():
+    if six.PY2:
+        raise SkipTest('asyncio is not available')
+
+    # a slow host is raced by the next one.
+    probe = _FakeProbe({'mx1': 5, 'mx2': 0})
+    with patch.object(aio, '_probe', probe):
+        exchanger = _run(aio.connect_to_mail_exchanger_async(
+            ['mx1', 'mx2'], delay=0.01))
+    assert_equal('mx2', exchanger)
+
+    # failing hosts are skipped without waiting.
+    probe = _FakeProbe({'mx2': None, 'mx3': 0})
+    with patch.object(aio, '_probe', probe):
+        exchanger = _run(aio.connect_to_mail_exchanger_async(
+            ['mx1', 'mx2', 'mx3'], delay=5))
+    assert_equal('mx3', exchanger)
+
+    probe = _FakeProbe({})
+    with patch.object(aio, '_probe', probe):
+        exchanger = _run(aio.connect_to_mail_exchanger_async(['mx1', 'mx2']))
+    assert_equal(None, exchanger)
+    assert_equal(['mx1', 'mx2'], probe.probed)
+
+
+def test_validate_address_async():
+    if six.PY2:
+        raise SkipTest('asyncio is not available')
+
+    dns_lookup, mx_cache, probe = _setup_drivers(
+        {'mailgun.com.': ['mxa.mailgun.org']}, {'mxa.mailgun.org': 0})
+    try:
+        with patch.object(aio, '_probe', probe):
+            paddr, metrics = _run(aio.validate_address_async(
+                'Foo@Mailgun.com', metrics=True))
+            assert_equal('Foo@mailgun.com', paddr.address)
+            assert_equal({'mailgun.com': 'mxa.mailgun.org'}, mx_cache.values)
+            assert_equal(sorted(address._validation_mtimes()),
+                         sorted(metrics))
+
+            # the cached mail exchanger is used.
+            _run(aio.validate_address_async('bar@mailgun.com'))
+            assert_equal(['mailgun.com.'], dns_lookup.lookups)
+
+            assert_equal(None, _run(aio.validate_address_async('foo@bar.com')))
+            assert_equal(None, _run(aio.validate_address_async('foo')))
+            assert_equal('foo@bar.com', _run(aio.validate_address_async(
+                'foo@bar.com', skip_remote_checks=True)).address)
+    finally:
+        _teardown_drivers()
+
+
+def test_validate_list_async():
+    if six.PY2:
+        raise SkipTest('asyncio is not available')
+
+    dns_lookup, mx_cache, probe = _setup_drivers(
+        {'mailgun.com.': ['mxa.mailgun.org'],
+         'example.com.': ['mx.example.com']},
+        {'mxa.mailgun.org': 0})
+    try:
+        with patch.object(aio, '_probe', probe):
+            addr_list = 'a@mailgun.com, B <b@mailgun.com>, c@example.com'
+            plist, ulist = _run(aio.validate_list_async(addr_list,
+                                                        as_tuple=True))
+    finally:
+        _teardown_drivers()
+
+    assert_equal(['a@mailgun.com', 'b@mailgun.com'],
+                 [p.address for p in plist])
+    assert_equal(['c@example.com'], ulist)
+    # every domain is looked up once.
+    assert_equal(sorted(['mailgun.com.', 'example.com.']),
+                 sorted(dns_lookup.lookups))
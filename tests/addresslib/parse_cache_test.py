@@ -0,0 +1,109 @@
+# coding:utf-8
+
+import threading
+
+from mock import patch
+from nose.tools import assert_equal, assert_is_not, assert_raises
+
+from flanker import addresslib
+from flanker.addresslib import address
+from flanker.addresslib.lru import LRUCache
+
+
+def test_parse_cache():
+    addresslib.set_parse_cache(10)
+    try:
+        cache = address._parse_cache
+        first = address.parse('Bob <bob@example.com>')
+        second = address.parse('Bob <bob@example.com>')
+        assert_equal(1, cache.hits)
+        assert_equal(1, cache.misses)
+        assert_equal(first.full_spec(), second.full_spec())
+        assert_is_not(first, second)
+
+        # results handed out can be changed without affecting the cache.
+        second._display_name = u'Alice'
+        assert_equal(u'Bob', address.parse('Bob <bob@example.com>').display_name)
+
+        # invalid addresses are cached too.
+        assert_equal(None, address.parse('foo', strict=True))
+        assert_equal(None, address.parse('foo', strict=True))
+        assert_equal(3, cache.hits)
+
+        # parameters are a part of the key.
+        assert_equal(None, address.parse('Bob <bob@example.com>',
+                                         addr_spec_only=True))
+        assert_equal(3, cache.hits)
+
+        addresslib.clear_parse_cache()
+        assert_equal(0, len(cache))
+        assert_equal(0, cache.hits)
+    finally:
+        addresslib.set_parse_cache(None)
+
+
+def test_parse_list_cache():
+    addresslib.set_parse_cache(10)
+    try:
+        parsed, unparsed = address.parse_list('a@b.com, c@d.com',
+                                              as_tuple=True)
+        parsed.append(address.parse('e@f.com'))
+        unparsed.append('bar')
+
+        parsed, unparsed = address.parse_list('a@b.com, c@d.com',
+                                              as_tuple=True)
+        assert_equal(1, address._parse_cache.hits)
+        assert_equal(['a@b.com', 'c@d.com'], [a.address for a in parsed])
+    finally:
+        addresslib.set_parse_cache(None)
+
+
+def test_parse_cache_metrics():
+    addresslib.set_parse_cache(10)
+    try:
+        with patch.object(address.flanker_metrics, 'incr') as incr:
+            address.parse('bob@example.com')
+            address.parse('bob@example.com')
+        assert_equal([(('address.parse_cache.miss',),),
+                      (('address.parse_cache.hit',),)],
+                     incr.call_args_list)
+    finally:
+        addresslib.set_parse_cache(None)
+
+
+def test_parse_cache_disabled():
+    with patch.object(address.flanker_metrics, 'incr') as incr:
+        address.parse('bob@example.com')
+    assert_equal(0, incr.call_count)
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert_equal(1, cache.get('a'))
+    cache['c'] = 3
+    # 'b' is the least recently used one
+    assert_equal(None, cache.get('b'))
+    assert_equal(1, cache.get('a'))
+    assert_equal(3, cache.get('c'))
+    assert_equal(2, len(cache))
+    assert_raises(ValueError, LRUCache, 0)
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(100)
+
+    def run(n):
+        for i in range(1000):
+            cache[(n, i % 150)] = i
+            cache.get((n, i % 150))
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert_equal(100, len(cache))
+    assert_equal(8000, cache.hits + cache.misses)
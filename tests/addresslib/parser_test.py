@@ -2,8 +2,15 @@
 
 from nose.tools import assert_equal, assert_true, assert_false
 
-from flanker.addresslib.address import is_email
+from flanker.addresslib._parser.lexer import lexer
+from flanker.addresslib._parser.parser import (addr_spec_parser,
+                                               mailbox_or_url_parser)
+from flanker.addresslib.address import (is_email, _parse_simple,
+                                        _to_parser_input)
 from flanker.mime.message.headers.encodedword import mime_to_unicode
+from tests import (MAILBOX_VALID_TESTS, MAILBOX_INVALID_TESTS,
+                   ABRIDGED_LOCALPART_VALID_TESTS,
+                   ABRIDGED_LOCALPART_INVALID_TESTS, URL_VALID_TESTS)
 
 
 def test_is_email():
@@ -18,3 +25,42 @@ def test_header_to_unicode():
     assert_equal(u'Eugueny ώ Kontsevoy', mime_to_unicode("=?UTF-8?Q?Eugueny_=CF=8E_Kontsevoy?=") )
     assert_equal(u'hello', mime_to_unicode("hello"))
     assert_equal(None, mime_to_unicode(None))
+
+
+def test_parse_simple_same_as_parser():
+    """
+    Addresses recognized without the parser are parsed exactly the way the
+    parser does it.
+    """
+    addr_specs = [line.strip() for line in
+                  (MAILBOX_VALID_TESTS + MAILBOX_INVALID_TESTS +
+                   ABRIDGED_LOCALPART_VALID_TESTS +
+                   ABRIDGED_LOCALPART_INVALID_TESTS +
+                   URL_VALID_TESTS).splitlines()
+                  if line.strip() and not line.startswith('#')]
+    addr_specs += ['a@b', 'a.@b', '.a@b', 'a..b@c', 'a@b.', 'a@[1.2.3.4]',
+                   'a@b@c', 'http://a@b']
+    display_names = ['', 'John', 'John Smith', 'J. Smith', 'John \t  Smith',
+                     '.', '..x', 'a.b.c', '=?utf-8?b?0J/RgNC40LLQtdGC?=',
+                     '"John" Smith', 'John (Smith)', u'Jöhn', 'a,b']
+
+    corpus = list(addr_specs)
+    for display_name in display_names:
+        for addr_spec in addr_specs:
+            for fmt in (u'{0} <{1}>', u'{0}<{1}>', u'{0} < {1} >'):
+                corpus.append(fmt.format(display_name, addr_spec).strip())
+
+    recognized = 0
+    for address in corpus:
+        address = _to_parser_input(address)
+        for addr_spec_only, parser in ((True, addr_spec_parser),
+                                       (False, mailbox_or_url_parser)):
+            parse_rs = _parse_simple(address, addr_spec_only)
+            if parse_rs is None:
+                continue
+
+            recognized += 1
+            assert_equal(parser.parse(address, lexer=lexer.clone()),
+                         parse_rs)
+
+    assert_true(recognized > 1000)
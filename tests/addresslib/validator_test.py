@@ -399,3 +399,36 @@ def test_bad_tld():
     )
     assert_equal(addr_obj, None)
     assert_not_equal(metrics['tld_lookup'], 0)
+
+
+def test_validate_batch():
+    addr_specs = ['a@mailgun.org', 'b@mailgun.org', 'c@example.com',
+                  'A <d@mailgun.org>', 'e@example.con', None,
+                  'f@fakecompany.mailgun.org', 'g@Mailgun.org']
+    with patch.object(address, 'mail_exchanger_lookup') as mock_method:
+        mock_method.side_effect = mock_exchanger_lookup
+
+        results, metrics = address.validate_batch(addr_specs, concurrency=2,
+                                                  metrics=True)
+        expected = [address.validate_address(a) for a in addr_specs]
+
+    assert_equal(expected, results)
+    assert_equal(['a@mailgun.org', 'b@mailgun.org', None, None, None, None,
+                  'f@fakecompany.mailgun.org', 'g@mailgun.org'],
+                 [r and r.address for r in results])
+
+    # every distinct domain is looked up only once
+    looked_up = [c[0][0] for c in mock_method.call_args_list[:3]]
+    assert_equal(sorted(['mailgun.org', 'example.com',
+                         'fakecompany.mailgun.org']), sorted(looked_up))
+    assert_equal(30, metrics['mx_lookup'])
+    assert_equal(90, metrics['mx_conn'])
+
+
+def test_validate_batch_skip_remote_checks():
+    with patch.object(address, 'mail_exchanger_lookup') as mock_method:
+        results = address.validate_batch(['a@example.com', 'b@example.con'],
+                                         skip_remote_checks=True)
+        assert_equal(0, mock_method.call_count)
+    assert_equal(['a@example.com', None], [r and r.address for r in results])
+    assert_equal([], address.validate_batch([]))
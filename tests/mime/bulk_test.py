@@ -0,0 +1,70 @@
+# coding:utf-8
+import threading
+from six.moves.cPickle import PicklingError
+
+from nose.tools import eq_, ok_, assert_raises
+
+from flanker.mime import create
+from flanker.mime.bulk import parse_many
+from flanker.mime.message.errors import DecodingError
+from .. import *
+
+
+def _content_types(message):
+    return [str(p.content_type) for p in message.walk(with_self=True)]
+
+
+def _fail(message):
+    raise ValueError('extract failed')
+
+
+def _lock(message):
+    return threading.Lock()
+
+
+MESSAGES = [TORTURE, ENCLOSED, BOUNCE, MAILGUN_PIC, TEXT_ONLY, MULTIPART]
+
+
+def parse_many_test():
+    expected = [_content_types(create.from_string(m)) for m in MESSAGES]
+
+    results = list(parse_many(iter(MESSAGES * 3), _content_types, workers=2,
+                              chunk_size=2))
+    eq_(list(range(len(MESSAGES) * 3)), [r.index for r in results])
+    eq_(expected * 3, [r.value for r in results])
+    ok_(all(r.error is None for r in results))
+
+
+def parse_many_unordered_test():
+    results = list(parse_many(MESSAGES, _content_types, workers=2,
+                              ordered=False, chunk_size=1))
+    eq_(list(range(len(MESSAGES))), sorted(r.index for r in results))
+    for r in results:
+        eq_(_content_types(create.from_string(MESSAGES[r.index])), r.value)
+
+
+def parse_many_decoding_error_test():
+    results = list(parse_many([TEXT_ONLY, ENCLOSED_ENDLESS, TEXT_ONLY],
+                              _content_types, workers=2))
+    eq_([None, None], [results[0].error, results[2].error])
+    ok_(isinstance(results[1].error, DecodingError))
+    eq_(None, results[1].value)
+
+
+def parse_many_extract_error_test():
+    assert_raises(ValueError, list, parse_many([TEXT_ONLY], _fail, workers=1))
+
+
+def parse_many_unpicklable_result_test():
+    for ordered in (True, False):
+        assert_raises(PicklingError, list,
+                      parse_many([TEXT_ONLY], _lock, workers=1,
+                                 ordered=ordered))
+
+
+def parse_many_unpicklable_extract_test():
+    # the task fails in the pool itself, before it gets to a worker.
+    for ordered in (True, False):
+        assert_raises((PicklingError, AttributeError), list,
+                      parse_many([TEXT_ONLY], lambda m: m.subject, workers=1,
+                                 ordered=ordered))
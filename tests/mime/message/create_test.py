@@ -1,8 +1,12 @@
 # coding:utf-8
 
 import json
+import tempfile
 from email.parser import Parser
 
+import six
+from six import BytesIO
+
 from nose.tools import *
 
 from flanker import _email
@@ -46,6 +50,41 @@ def from_part_message_simple_test():
     eq_(u'\r\n\r\n\r\n~Danielle', message.body)
 
 
+def from_file_test():
+    path = fixture_file('messages/enclosed.eml')
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    with open(path, 'rb') as f:
+        sources = (path, f, f.fileno())
+        messages = [create.from_file(source) for source in sources]
+
+    for message in messages:
+        parts = list(message.walk(with_self=True))
+        eq_(6, len(parts))
+        eq_(u'"Александр Клижентас☯" <bob@example.com>',
+            message.headers['To'])
+        eq_(create.from_string(raw, keep_bytes=True).parts[0].body,
+            message.parts[0].body)
+        # unchanged mapped messages are returned as bytes, not the mapping.
+        out = message.to_string()
+        ok_(isinstance(out, six.binary_type))
+        eq_(raw, out)
+        message.headers.prepend('X-Prepended', 'yes')
+        eq_(b'X-Prepended: yes\r\n' + raw, message.to_string())
+
+        message.headers['Subject'] = u'Привет'
+        eq_(u'Привет',
+            create.from_string(message.to_string()).headers['Subject'])
+
+
+def from_file_empty_test():
+    with tempfile.NamedTemporaryFile() as f:
+        message = create.from_file(f.name)
+        eq_('text/plain', message.content_type)
+        eq_(b'', message.to_string())
+
+
 def message_from_garbage_test():
     assert_raises(errors.DecodingError, create.from_string, None)
     assert_raises(errors.DecodingError, create.from_string, [])
@@ -336,6 +375,46 @@ def attaching_text_test():
     eq_(u"Привет, как дела", attachment.body)
 
 
+def attaching_files_test():
+    expected = create.attachment(
+        "application/octet-stream", MAILGUN_PNG, "mailgun.png",
+        "attachment").to_string()
+
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(MAILGUN_PNG)
+        f.flush()
+        f.seek(0)
+
+        sources = [f]
+        if six.PY3:
+            import pathlib
+            sources.append(pathlib.Path(f.name))
+
+        for source in sources:
+            attachment = create.attachment(
+                "application/octet-stream", source, "mailgun.png",
+                "attachment")
+            eq_("image/png", attachment.content_type)
+            eq_(MAILGUN_PNG, attachment.body)
+            eq_(expected, attachment.to_string())
+            # serialization does not exhaust the file
+            eq_(MAILGUN_PNG,
+                create.from_string(attachment.to_string()).body)
+
+            message = create.multipart("mixed")
+            message.append(attachment)
+            eq_(MAILGUN_PNG,
+                create.from_string(message.to_string()).parts[0].body)
+
+
+def attaching_text_file_test():
+    body = u"Привет, как дела".encode("koi8-r")
+    attachment = create.attachment(
+        "application/octet-stream", BytesIO(body), "/home/alex/hi.txt")
+    eq_("text/plain", attachment.content_type)
+    eq_(u"Привет, как дела", attachment.body)
+
+
 def guessing_text_encoding_test():
     text = create.text("plain", "hello", "utf-8")
     eq_('ascii', text.charset)
@@ -126,6 +126,31 @@ def headers_transform_encodedword_test():
     h.transform(lambda key,val: (key, val.replace(u'✓', u'☃')), decode=True)
     eq_(u'Hello ☃', h.get('Subject'))
 
+
+def headers_decoded_cache_test():
+    subject = encoding.to_mime('Subject', u'Hello ✓')
+    h = MimeHeaders([('Subject', subject), ('To', 'bob@example.com')])
+
+    # decoded values are kept, repeated reads do not decode them again
+    eq_(u'Hello ✓', h['Subject'])
+    ok_(h['Subject'] is h.get('Subject'))
+    ok_(h.getall('Subject')[0] is h['Subject'])
+    eq_(u'Hello ✓', dict(h.items())['Subject'])
+
+    h['Subject'] = encoding.to_mime('Subject', u'Hello ☃')
+    eq_(u'Hello ☃', h['Subject'])
+
+    h.prepend('Subject', u'Hi')
+    eq_([u'Hi', u'Hello ☃'], h.getall('Subject'))
+
+    h.transform(lambda key, val: (key, val.replace(u'☃', u'✓')), decode=True)
+    eq_(u'Hello ✓', h['Subject'])
+
+    del h['Subject']
+    eq_(None, h['Subject'])
+    eq_({}, h._decoded)
+
+
 def headers_parsing_empty_test():
     h = MimeHeaders.from_stream(StringIO(""))
     eq_(0, len(h))
@@ -175,6 +200,54 @@ def headers_roundtrip_test():
         headers2['DKIM-Signature'])
 
 
+def headers_raw_preserved_test():
+    block = ('Received: from mx.example.com\r\n'
+             '\tby relay.example.com; Mon, 1 Oct 2019 10:00:00 +0000\r\n'
+             'DKIM-Signature: v=1; d=example.com;\r\n h=from:to; b=abc=\r\n'
+             'Subject: =?utf-8?b?0J/RgNC40LLQtdGC?=\r\n'
+             'Content-Type: text/plain;\r\n charset="us-ascii"\r\n'
+             'To: bob@example.com\r\n')
+    headers = MimeHeaders.from_stream(StringIO(block + '\r\n'))
+    headers['To'] = 'alice@example.com'
+    out = StringIO()
+    headers.to_stream(out)
+
+    # headers that have not been changed are written as they were
+    eq_(block.replace('To: bob@example.com', 'To: alice@example.com'),
+        out.getvalue())
+
+    # parameters changed in place are encoded anew
+    headers['Content-Type'].params['charset'] = 'utf-8'
+    out = StringIO()
+    headers.to_stream(out)
+    ok_('Content-Type: text/plain; charset="utf-8"\r\n' in out.getvalue())
+
+    headers.transform(lambda key, val: (key, val.replace('mx', 'smtp'))
+                      if key == 'Received' else (key, val))
+    out = StringIO()
+    headers.to_stream(out)
+    ok_('Received: from smtp.example.com' in out.getvalue())
+    ok_('DKIM-Signature: v=1; d=example.com;\r\n h=from:to; b=abc=\r\n'
+        in out.getvalue())
+
+
+def headers_raw_line_endings_test():
+    block = ('Received: from mx.example.com\n'
+             '\tby relay.example.com; Mon, 1 Oct 2019 10:00:00 +0000\n'
+             'To: bob@example.com\r\n'
+             'Subject: hello\n')
+    headers = MimeHeaders.from_stream(StringIO(block + '\n'))
+    headers['To'] = 'alice@example.com'
+    out = StringIO()
+    headers.to_stream(out)
+
+    # raw headers get the line endings of generated ones
+    eq_('Received: from mx.example.com\r\n'
+        '\tby relay.example.com; Mon, 1 Oct 2019 10:00:00 +0000\r\n'
+        'Subject: hello\r\n'
+        'To: alice@example.com\r\n', out.getvalue())
+
+
 def test_folding_combinations():
     message = """From mrc@example.com Mon Feb  8 02:53:47 PST 1993\nTo: sasha\r\n  continued\n      line\nFrom: single line  \r\nSubject: hello, how are you\r\n today?"""
     headers = MimeHeaders.from_stream(StringIO(message))
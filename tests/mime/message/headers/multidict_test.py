@@ -0,0 +1,75 @@
+from nose.tools import eq_, ok_, assert_false, assert_raises
+
+from flanker.mime.message.headers.multidict import MultiDict
+
+
+def multidict_order_test():
+    d = MultiDict([('a', 1), ('b', 2), ('a', 3)])
+    d.prepend('c', 0)
+    d.prepend('a', -1)
+    d.add('b', 4)
+    eq_([('a', -1), ('c', 0), ('a', 1), ('b', 2), ('a', 3), ('b', 4)],
+        d.items())
+    eq_(['a', 'c', 'a', 'b', 'a', 'b'], d.keys())
+    eq_(6, len(d))
+
+
+def multidict_lookup_test():
+    d = MultiDict([('a', 1), ('b', 2), ('a', 3)])
+    d.prepend('a', 0)
+    eq_([0, 1, 3], d.getall('a'))
+    eq_([], d.getall('x'))
+    eq_(3, d.get('a'))
+    eq_(3, d['a'])
+    eq_(None, d.get('x'))
+    eq_(5, d.get('x', 5))
+    assert_raises(KeyError, lambda: d['x'])
+    ok_('b' in d)
+    assert_false('x' in d)
+
+
+def multidict_set_and_delete_test():
+    d = MultiDict([('a', 1), ('b', 2), ('a', 3)])
+    d['a'] = 4
+    eq_([('b', 2), ('a', 4)], d.items())
+
+    del d['a']
+    eq_([('b', 2)], d.items())
+    assert_false('a' in d)
+
+    def delete():
+        del d['a']
+    assert_raises(KeyError, delete)
+
+
+def multidict_compaction_test():
+    d = MultiDict()
+    for i in range(100):
+        d.prepend('a', i)
+        d.add('b', i)
+        d['c'] = i
+    eq_(201, len(d))
+    ok_(len(d._front) + len(d._back) < 2 * 201)
+    eq_(list(reversed(range(100))), d.getall('a'))
+    eq_(list(range(100)), d.getall('b'))
+    eq_([99], d.getall('c'))
+    eq_(('c', 99), d.items()[-1])
+
+
+def multidict_extras_test():
+    d = MultiDict()
+    d.add('a', 1, 'raw a')
+    d.prepend('b', 2, 'raw b')
+    d.add('c', 3)
+    eq_([('b', 2, 'raw b'), ('a', 1, 'raw a'), ('c', 3, None)],
+        list(d.iterextras()))
+
+    # extra data goes away with the items
+    d['a'] = 4
+    eq_([('b', 2, 'raw b'), ('c', 3, None), ('a', 4, None)],
+        list(d.iterextras()))
+
+    for i in range(10):
+        d['c'] = i
+    eq_([('b', 2, 'raw b'), ('a', 4, None), ('c', 9, None)],
+        list(d.iterextras()))
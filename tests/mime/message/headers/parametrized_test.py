@@ -66,3 +66,21 @@ def content_types_test():
 
 def content_type_param_with_spaces_test():
     eq_(('multipart/alternative',{'boundary':'nextPart'}), parametrized.decode("multipart/alternative; boundary = nextPart"))
+
+
+def lazy_params_test():
+    h = 'multipart/mixed; boundary="abc"; title*0*=us-ascii\'en\'Hi%20; title*1=there'
+    value, params = parametrized.decode(h, lazy=True)
+    eq_('multipart/mixed', value)
+    ok_(isinstance(params, parametrized.LazyParams))
+    eq_({}, dict(params))
+    ok_(params.may_have('boundary'))
+    assert_false(params.may_have('charset'))
+    assert_false(params.changed())
+
+    params.load()
+    eq_(parametrized.decode(h), (value, params))
+    assert_false(params.changed())
+
+    params['charset'] = 'utf-8'
+    ok_(params.changed())
@@ -5,3 +5,15 @@ from flanker.mime.message.headers import parsing
 def test_content_type_star():
     _, ctype = parsing.parse_header('Content-Type: image/* ; name="Stuart *Wells.PNG"')
     eq_(ctype.value, 'image/*')
+
+
+def test_normalize():
+    eq_('Content-Type', parsing.normalize('content-TYPE'))
+    eq_('Message-Id', parsing.normalize('Message-ID'))
+    eq_('X-Custom-Header', parsing.normalize('x-custom-header'))
+
+    # normalized names are shared
+    ok_(parsing.normalize('X-CUSTOM-HEADER') is
+        parsing.normalize('x-Custom-header'))
+    ok_(parsing.normalize('dkim-signature') is
+        parsing.normalize('DKIM-Signature'))
@@ -1,6 +1,9 @@
-from nose.tools import eq_
+import pickle
 
-from flanker.mime.message.headers.wrappers import ContentType
+from nose.tools import eq_, ok_
+
+from flanker.mime.message.headers.parametrized import LazyParams
+from flanker.mime.message.headers.wrappers import ContentType, WithParams
 
 def charset_test():
     c = ContentType('text', 'plain')
@@ -8,3 +11,49 @@ def charset_test():
 
     c = ContentType('application', 'pdf')
     eq_(None, c.get_charset())
+
+
+def content_type_test():
+    c = ContentType('Text', 'HTML', {'charset': 'utf-8'})
+    eq_('text', c.main)
+    eq_('html', c.sub)
+    eq_('text/html', c.value)
+    ok_(ContentType('text', 'html').value is c.value)
+    ok_(not hasattr(c, '__dict__'))
+
+
+def pickle_test():
+    c = ContentType('multipart', 'mixed', {'boundary': 'x'})
+    eq_(c, pickle.loads(pickle.dumps(c)))
+
+    w = WithParams('attachment', {'filename': 'a.txt'})
+    eq_(w, pickle.loads(pickle.dumps(w)))
+
+
+def lazy_params_test():
+    c = ContentType('text', 'plain', LazyParams('charset="utf-8"'))
+    eq_(('text/plain', {'charset': 'utf-8'}), c)
+    eq_(ContentType('text', 'plain', {'charset': 'utf-8'}), c)
+    eq_('utf-8', c.get_charset())
+
+    c = ContentType('multipart', 'mixed', LazyParams('boundary=x'))
+    eq_('x', c.get_boundary())
+    c = ContentType('text', 'plain', LazyParams('charset=ascii'))
+    eq_(None, c.get_boundary())
+    eq_({}, tuple.__getitem__(c, 1))
+
+    w = WithParams('attachment', LazyParams('filename="a.txt"'))
+    value, params = w
+    eq_({'filename': 'a.txt'}, params)
+    eq_(WithParams('attachment', {'filename': 'a.txt'}), w)
+    eq_(w, pickle.loads(pickle.dumps(w)))
+
+    # parameters are pickled both before and after they are decoded.
+    params = pickle.loads(pickle.dumps(LazyParams('charset=ascii')))
+    params.load()
+    eq_({'charset': 'ascii'}, params)
+    ok_(not params.changed())
+    params['charset'] = 'utf-8'
+    params = pickle.loads(pickle.dumps(params))
+    eq_({'charset': 'utf-8'}, params)
+    ok_(params.changed())
@@ -0,0 +1,104 @@
+# coding:utf-8
+import os
+import tempfile
+
+import six
+from mock import patch
+from nose.tools import eq_, ok_, assert_raises
+
+from flanker.mime import create
+from flanker.mime.message.errors import DecodingError
+from flanker.mime.message.headers import MimeHeaders
+from flanker.mime.message.index import StructureIndex
+from ... import *
+
+
+def _structure(part):
+    return (part.content_type, part._container.start, part._container.end,
+            [_structure(p) for p in part.parts],
+            _structure(part.enclosed) if part.enclosed else None)
+
+
+def index_round_trip_test():
+    for string in (TORTURE, ENCLOSED, BOUNCE, MAILGUN_PIC, TEXT_ONLY):
+        message = create.from_string(string)
+        data = create.structure_index(message).dumps()
+
+        indexed = StructureIndex.loads(data).to_message(string)
+        eq_(_structure(message), _structure(indexed))
+        eq_(message.to_string(), indexed.to_string())
+        eq_([p.body for p in message.walk() if p.content_type.is_singlepart()],
+            [p.body for p in indexed.walk() if p.content_type.is_singlepart()])
+
+
+def index_entries_test():
+    message = create.from_string(MAILGUN_PIC)
+    index = create.structure_index(message)
+
+    eq_(1, index.to_dict()['version'])
+    eq_(len(MAILGUN_PIC), index.size)
+    eq_(2, len(index.root.parts))
+
+    entry = index.root.parts[1]
+    eq_('image/png', entry.content_type)
+    part = message.parts[1]
+    eq_(part._container.read_body(),
+        MAILGUN_PIC[entry.body_start:entry.end + 1])
+    eq_(entry.end - entry.start + 1, entry.size)
+
+
+def index_from_file_test():
+    string = MAILGUN_PIC.encode('utf-8')
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(string)
+
+        index = create.structure_index(create.from_file(path))
+        ok_(index.binary)
+        message = create.from_file(path, index=StructureIndex.loads(
+            index.dumps()))
+        eq_(string, message.to_string())
+        eq_(create.from_file(path).parts[1].body, message.parts[1].body)
+    finally:
+        os.remove(path)
+
+
+def index_mismatch_test():
+    index = create.structure_index(create.from_string(TEXT_ONLY))
+    assert_raises(DecodingError, index.to_message, TEXT_ONLY + '\r\n')
+
+    # text and binary messages are told apart in Python 3 only.
+    if six.PY3:
+        index.binary = True
+        assert_raises(DecodingError, index.to_message, TEXT_ONLY)
+
+    data = index.to_dict()
+    data['version'] = 100
+    assert_raises(DecodingError, StructureIndex.from_dict, data)
+
+
+def index_changed_message_test():
+    message = create.from_string(TEXT_ONLY)
+    message.headers['Subject'] = u'Changed'
+    assert_raises(DecodingError, create.structure_index, message)
+
+
+def index_headers_not_parsed_test():
+    message = create.from_string(MAILGUN_PIC)
+    body = message.parts[1].body
+    with patch.object(MimeHeaders, 'from_stream',
+                      wraps=MimeHeaders.from_stream) as from_stream:
+        index = create.structure_index(message)
+        eq_(0, from_stream.call_count)
+
+        indexed = index.to_message(MAILGUN_PIC)
+        container = indexed.parts[1]._container
+        eq_(index.root.parts[1].body_start, container._body_start)
+        eq_(message.parts[1]._container.read_body(), container.read_body())
+        eq_(0, from_stream.call_count)
+
+        # opening the attachment parses its headers once.
+        eq_(body, indexed.parts[1].open_body().read())
+        eq_(1, from_stream.call_count)
+        eq_(index.root.parts[1].body_start, container._body_start)
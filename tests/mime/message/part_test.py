@@ -1,14 +1,19 @@
 # coding:utf-8
 from contextlib import closing
+from multiprocessing.pool import ThreadPool
 
+import six
+from nose.plugins.skip import SkipTest
 from nose.tools import eq_, ok_, assert_false, assert_raises, assert_less
+from six import BytesIO
 from six.moves import StringIO
 
 from flanker import _email
 from flanker.mime import recover
 from flanker.mime.create import multipart, text
 from flanker.mime.message.errors import EncodingError
-from flanker.mime.message.part import _encode_transfer_encoding, _base64_decode
+from flanker.mime.message.part import (_encode_transfer_encoding, _base64_decode,
+                                       _walk_paths)
 from flanker.mime.message.scanner import scan
 from tests import (BILINGUAL, BZ2_ATTACHMENT, ENCLOSED, TORTURE, TORTURE_PART,
                    ENCLOSED_BROKEN_ENCODING, EIGHT_BIT, QUOTED_PRINTABLE,
@@ -46,6 +51,75 @@ def readonly_immutability_test():
     eq_(ENCLOSED, message.to_string())
 
 
+def change_propagation_test():
+    message = scan(ENCLOSED)
+    enclosed = message.parts[1].enclosed
+    enclosed.parts[1].headers['X-Changed'] = 'yes'
+    ok_(enclosed.parts[1].was_changed())
+    ok_(enclosed.was_changed())
+    ok_(message.parts[1].was_changed())
+    ok_(message.was_changed())
+    assert_false(message.parts[0].was_changed())
+    assert_false(enclosed.parts[0].was_changed())
+
+    # prepended headers of the message itself can be ignored, but not ones
+    # prepended to its parts.
+    message = scan(ENCLOSED)
+    message.headers.prepend('X-Prepended', 'yes')
+    ok_(message.was_changed())
+    assert_false(message.was_changed(ignore_prepends=True))
+    message.parts[0].headers.prepend('X-Prepended', 'yes')
+    ok_(message.was_changed(ignore_prepends=True))
+    assert_false(message.parts[0].was_changed(ignore_prepends=True))
+
+    message = scan(ENCLOSED)
+    message.parts[1].enclosed.parts[0].body = u'Changed'
+    ok_(message.was_changed(ignore_prepends=True))
+
+    # enclosing another message changes the container, and the message that
+    # has been replaced no longer affects it.
+    message = scan(ENCLOSED)
+    removed = message.parts[1].enclosed
+    message.parts[1].enclose(scan(TEXT_ONLY))
+    ok_(message.was_changed())
+    removed.headers['Subject'] = u'Changed'
+    assert_false(message.parts[1].enclosed.was_changed())
+    ok_(TEXT_ONLY in message.to_string())
+
+
+def direct_parts_change_test():
+    message = scan(MULTIPART)
+    size = message.size
+    message.parts.append(text('plain', u'NEWPART'))
+    ok_(message.was_changed())
+    ok_('NEWPART' in message.to_string())
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+    ok_(message.size > size)
+
+    message = scan(MULTIPART)
+    removed = message.parts.pop()
+    ok_(message.was_changed())
+    ok_(removed._parent is None)
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+    message = scan(MULTIPART)
+    message.parts[0] = text('plain', u'REPLACED')
+    ok_(message.was_changed())
+    ok_(message.parts[0]._parent is message)
+    ok_('REPLACED' in message.to_string())
+
+
+def direct_enclosed_change_test():
+    message = scan(ENCLOSED)
+    removed = message.parts[1].enclosed
+    message.parts[1].enclosed = scan(TEXT_ONLY)
+    ok_(message.was_changed())
+    ok_(removed._parent is None)
+    ok_(message.parts[1].enclosed._parent is message.parts[1])
+    ok_(TEXT_ONLY in message.to_string())
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+
 # We can change the headers without changing the body.
 def top_level_headers_immutability_test():
     message = scan(ENCLOSED)
@@ -346,6 +420,53 @@ def walk_test():
         [str(p.content_type) for p in message.walk(skip_enclosed=True)])
 
 
+def walk_filters_test():
+    message = scan(ENCLOSED)
+    eq_(['text/plain', 'text/plain', 'text/html'],
+        [str(p.content_type) for p in message.walk(content_type='text/*')])
+    eq_(['text/html'],
+        [str(p.content_type) for p in message.walk(content_type='TEXT/HTML')])
+    eq_(['multipart/mixed', 'text/plain', 'message/rfc822'],
+        [str(p.content_type)
+         for p in message.walk(with_self=True, max_depth=1)])
+    eq_(['text/plain', 'message/rfc822', 'multipart/alternative'],
+        [str(p.content_type) for p in message.walk(max_depth=2)])
+
+    message = scan(MAILGUN_PIC)
+    eq_([message.parts[1]], list(message.walk(attachments_only=True)))
+    eq_([], list(message.walk(content_type='text/*', attachments_only=True)))
+
+
+def walk_deep_nesting_test():
+    message = text('plain', u'hello')
+    for _ in range(2000):
+        container = multipart('mixed')
+        container.append(message)
+        message = container
+    eq_(2001, len(list(message.walk(with_self=True))))
+    eq_(['text/plain'], [str(p.content_type)
+                         for p in message.walk(content_type='text/plain')])
+
+
+def part_by_path_test():
+    message = scan(TORTURE)
+    for part_path, part in _walk_paths(message):
+        found = message.part_by_path(part_path)
+        # enclosed multipart messages share paths with their containers.
+        if found is not part:
+            ok_(found.content_type.is_message_container())
+            ok_(found.enclosed is part)
+
+    eq_(message, message.part_by_path(''))
+    eq_(message.parts[1].enclosed.parts[0], message.part_by_path('2.1'))
+    eq_(None, message.part_by_path('100'))
+    eq_(None, message.part_by_path('1.x'))
+
+    message = scan(TEXT_ONLY)
+    eq_(message, message.part_by_path('1'))
+    eq_(None, message.part_by_path('2'))
+
+
 def to_string_test():
     ok_(str(scan(ENCLOSED)))
     ok_(str(scan(TORTURE)))
@@ -540,6 +661,41 @@ def message_size_test():
     eq_(len(message.to_string()), message.size)
 
 
+def message_size_in_bytes_test():
+    message = multipart('mixed')
+    message.append(text('plain', u'Привет'), text('plain', u'hello'))
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+    message = scan(BILINGUAL)
+    message.headers['Subject'] = u'Привет'
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+
+def message_size_cache_test():
+    message = scan(TORTURE)
+    message.headers['Subject'] = u'Changed'
+    eq_(len(message.to_string()), message.size)
+    # Sizes of parts are kept until the parts change.
+    for part in message.parts:
+        ok_(part._size is not None)
+
+    part = message.parts[1].enclosed.parts[0]
+    part.body = u'Привет'
+    eq_(None, part._size)
+    eq_(None, message._size)
+    ok_(message.parts[0]._size is not None)
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+    part.headers.prepend('X-Spam', u'No')
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+    message.append(text('plain', u'Ещё'))
+    eq_(len(message.to_string().encode('utf-8')), message.size)
+
+    # Serializing the message does not change the parts again.
+    ok_(part._size is not None)
+
+
 def message_convert_to_python_test():
     message = scan(IPHONE)
     a = message.to_python_message()
@@ -619,6 +775,152 @@ def read_body_test():
     ok_(body.endswith("--===============4360815924781479146==--"))
 
 
+def views_test():
+    part = scan(MULTIPART)
+    eq_(part._container.read_message(), part._container.message_view())
+    eq_(part.parts[0]._container.read_body(),
+        part.parts[0]._container.body_view())
+
+    # binary messages are sliced as memoryviews in Python 3 only.
+    if six.PY3:
+        part = scan(MULTIPART.encode('utf-8'), keep_bytes=True)
+        view = part.parts[1]._container.message_view()
+        ok_(isinstance(view, memoryview))
+        eq_(part.parts[1]._container.read_message(), view.tobytes())
+        view = part.parts[0]._container.body_view()
+        ok_(isinstance(view, memoryview))
+        eq_(b'Sasha\r\n', view.tobytes())
+
+
+def to_stream_unchanged_parts_not_copied_test():
+    if six.PY2:
+        raise SkipTest('memoryview slices are Python 3 only')
+
+    class _RecordingIO(BytesIO):
+        def __init__(self):
+            BytesIO.__init__(self)
+            self.views = 0
+
+        def write(self, s):
+            if isinstance(s, memoryview):
+                self.views += 1
+            return BytesIO.write(self, s)
+
+    message = scan(ENCLOSED.encode('utf-8'), keep_bytes=True)
+    message.parts[1].enclosed.headers['Subject'] = u'Привет'
+    with closing(_RecordingIO()) as out:
+        message.to_stream(out)
+        eq_(3, out.views)
+        binary = out.getvalue()
+
+    expected = scan(ENCLOSED)
+    expected.parts[1].enclosed.headers['Subject'] = u'Привет'
+    eq_(expected.to_string().encode('utf-8'), binary)
+
+    # text streams get message views converted to text.
+    with closing(StringIO()) as out:
+        message.to_stream(out)
+        eq_(expected.to_string(), out.getvalue())
+
+
+def open_body_test():
+    message = scan(MAILGUN_PIC)
+    png = message.parts[1]
+    eq_('base64', png.content_encoding.value)
+    for chunk_size in (1, 3, 1024):
+        with closing(png.open_body(chunk_size)) as body:
+            eq_(MAILGUN_PNG[:10], body.read(10))
+            eq_(MAILGUN_PNG[10:], body.read())
+
+    message = scan(MAILGUN_PIC.encode('utf-8'), keep_bytes=True)
+    eq_(MAILGUN_PNG, message.parts[1].open_body(7).read())
+
+    # multipart containers have no body.
+    eq_(None, message.open_body())
+
+
+def open_body_quoted_printable_test():
+    part = scan(QUOTED_PRINTABLE).parts[0]
+    eq_('quoted-printable', part.content_encoding.value)
+    body = part.open_body(5).read()
+    eq_(part.body, body.decode(part.charset))
+
+
+def open_body_base64_padding_test():
+    for body in ('YQ==YQ==', 'YQ=\r\n=YWJj', 'YQ=YQ==', 'YW\r\nJj=YQ', 'YWJjY'):
+        part = scan('Content-Type: application/octet-stream\r\n'
+                    'Content-Transfer-Encoding: base64\r\n\r\n' + body)
+        for chunk_size in (1, 3, 1024):
+            eq_(part.body, part.open_body(chunk_size).read())
+
+
+def open_body_changed_test():
+    message = scan(MAILGUN_PIC)
+    part = message.parts[0].parts[0]
+    part.body = u'Привет'
+    eq_(u'Привет'.encode('utf-8'), part.open_body().read())
+
+    eq_(b'hello', text('plain', u'hello').open_body().read())
+
+
+def _read_part(part):
+    body = None
+    if part.content_type.is_singlepart():
+        body = part.body, part.open_body(16).read()
+    return list(part.headers.items()), body, part._container.read_message()
+
+
+def concurrent_reads_test():
+    # parts of one message are loaded by many threads at once.
+    pool = ThreadPool(8)
+    try:
+        for string, keep_bytes in ((TORTURE, False), (TORTURE_PART, False),
+                                   (TORTURE.encode('utf-8'), True)):
+            expected = [_read_part(p) for p in
+                        scan(string, keep_bytes).walk(with_self=True)]
+            for _ in range(3):
+                parts = list(scan(string, keep_bytes).walk(with_self=True))
+                eq_(expected * 2, pool.map(_read_part, parts * 2))
+    finally:
+        pool.terminate()
+
+
+def decode_all_test():
+    message = scan(MAILGUN_PIC)
+    bodies = message.decode_all()
+    eq_(['1.1', '1.2', '2'], list(bodies))
+    eq_(MAILGUN_PNG, bodies['2'])
+    eq_(message.parts[0].parts[1].body, bodies['1.2'])
+
+    eq_(['1'], list(scan(TEXT_ONLY).decode_all()))
+
+    # an enclosed message has the path of the part that encloses it.
+    message = scan(ENCLOSED)
+    eq_(['1', '2.1', '2.2'], list(message.decode_all()))
+    eq_(message.parts[1].enclosed.parts[1].body, message.decode_all()['2.2'])
+
+    # changed bodies are returned as they are.
+    message = scan(MAILGUN_PIC)
+    message.parts[0].parts[0].body = u'Привет'
+    eq_(u'Привет', message.decode_all()['1.1'])
+
+
+def decode_all_executor_test():
+    if six.PY2:
+        raise SkipTest('concurrent.futures is Python 3 only')
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    for string, keep_bytes in ((TORTURE, False),
+                               (TORTURE.encode('utf-8'), True)):
+        expected = scan(string, keep_bytes).decode_all()
+        with ThreadPoolExecutor(4) as executor:
+            eq_(expected, scan(string, keep_bytes).decode_all(executor))
+        with ProcessPoolExecutor(2) as executor:
+            message = scan(string, keep_bytes)
+            eq_(expected, message.decode_all(executor))
+            eq_(expected['2.1'], message.parts[1].enclosed.parts[0].body)
+
+
 def test_encode_transfer_encoding():
     body = "long line " * 100
     encoded_body = _encode_transfer_encoding('base64', body)
@@ -1,10 +1,14 @@
 # coding:utf-8
+import mmap
+import tempfile
+
 import six
 from nose.tools import *
 
 from flanker import _email
 from flanker.mime.message.errors import DecodingError
-from flanker.mime.message.scanner import scan, ContentType, Boundary
+from flanker.mime.message.scanner import (scan, ContentType, Boundary,
+                                          FeedScanner, scan_headers)
 from ... import *
 
 C = ContentType
@@ -265,6 +269,141 @@ def missing_newline_test():
     eq_("hello, world", message.body)
 
 
+def keep_bytes_test():
+    for mime in (ENCLOSED, TORTURE, BILINGUAL, NOTIFICATION):
+        binary = mime.encode('utf-8')
+        message = scan(binary, keep_bytes=True)
+        expected = scan(mime)
+
+        eq_(tree_to_string(expected), tree_to_string(message))
+        for a, b in zip(expected.walk(with_self=True),
+                        message.walk(with_self=True)):
+            eq_(list(a.headers.items()), list(b.headers.items()))
+            if a.content_type.main == 'text':
+                eq_(a.body, b.body)
+
+        eq_(binary, message.to_string())
+
+
+def keep_bytes_broken_encoding_test():
+    # headers that are not utf-8 are decoded a block at a time, the same
+    # way as when the message is decoded before scanning.
+    message = scan(ENCLOSED_BROKEN_ENCODING, keep_bytes=True)
+    expected = scan(ENCLOSED_BROKEN_ENCODING)
+    for a, b in zip(expected.walk(with_self=True),
+                    message.walk(with_self=True)):
+        eq_(list(a.headers.items()), list(b.headers.items()))
+
+
+def keep_bytes_alter_test():
+    message = scan(ENCLOSED.encode('utf-8'), keep_bytes=True)
+    message.headers['Subject'] = u'Привет'
+    message.parts[1].enclosed.parts[0].body = u'Как дела?'
+
+    expected = scan(ENCLOSED)
+    expected.headers['Subject'] = u'Привет'
+    expected.parts[1].enclosed.parts[0].body = u'Как дела?'
+
+    out = message.to_string()
+    ok_(isinstance(out, six.binary_type))
+    eq_(expected.to_string().encode('utf-8'), out)
+    eq_(u'Как дела?', scan(out, keep_bytes=True).parts[1].enclosed.parts[0].body)
+
+
+def feed_scanner_test():
+    for mime in (ENCLOSED, TORTURE, MULTIPART, MAILGUN_PIC):
+        expected = scan(mime)
+        for data in (mime, mime.encode('utf-8')):
+            for size in (1, 7, 1000):
+                scanner = FeedScanner()
+                for i in range(0, len(data), size):
+                    scanner.feed(data[i:i+size])
+                message = scanner.close()
+
+                eq_(tree_to_string(expected), tree_to_string(message))
+                eq_(data, message.to_string())
+
+
+def feed_scanner_max_size_test():
+    scanner = FeedScanner(max_size=100)
+    scanner.feed(TORTURE[:60])
+    assert_raises(DecodingError, scanner.feed, TORTURE[60:120])
+
+
+def feed_scanner_mixed_chunks_test():
+    scanner = FeedScanner()
+    scanner.feed(b'Content-Type: text/plain\r\n')
+    assert_raises(DecodingError, scanner.feed, u'\r\nhello')
+
+
+def feed_scanner_empty_test():
+    eq_(scan('').content_type, FeedScanner().close().content_type)
+
+
+def scan_headers_test():
+    for mime in (ENCLOSED, TORTURE, ENCLOSED.encode('utf-8')):
+        expected = scan(mime, keep_bytes=True)
+        header_block = scan_headers(mime, keep_bytes=True)
+        eq_(list(expected.headers.items()),
+            list(header_block.headers.items()))
+        eq_(expected._container._body_start, header_block.body_start)
+
+        message = header_block.to_message()
+        ok_(message.headers is header_block.headers)
+        eq_(tree_to_string(expected), tree_to_string(message))
+        eq_(mime, message.to_string())
+
+        header_block.headers['Subject'] = u'Привет'
+        eq_(u'Привет', scan(header_block.to_message().to_string(),
+                            keep_bytes=True).headers['Subject'])
+
+
+def scan_headers_decoding_test():
+    mime = ENCLOSED.encode('utf-8')
+    expected = scan(mime)
+    header_block = scan_headers(mime)
+    eq_(list(expected.headers.items()), list(header_block.headers.items()))
+    eq_(tree_to_string(expected), tree_to_string(header_block.to_message()))
+    eq_(expected.to_string(), header_block.to_message().to_string())
+
+    # the header block is decoded on its own, the body only when needed.
+    mime = (u'Subject: Привет\r\n\r\n'.encode('utf-8') +
+            u'Grüße aus Köln'.encode('latin-1'))
+    header_block = scan_headers(mime)
+    eq_(u'Привет', header_block.headers['Subject'])
+    message = header_block.to_message()
+    eq_(u'Привет', message.headers['Subject'])
+    ok_(u'Gr' in message.body)
+
+
+def scan_headers_mmap_test():
+    mime = u'Subject: Привет\r\n\r\nBody text here\r\n'.encode('utf-8')
+    with tempfile.TemporaryFile() as f:
+        f.write(mime)
+        f.flush()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header_block = scan_headers(mapped)
+            eq_(u'Привет', header_block.headers['Subject'])
+            message = header_block.to_message()
+            eq_(u'Body text here\r\n', message.body)
+            eq_(mime, message.to_string())
+        finally:
+            mapped.close()
+
+
+def scan_headers_no_body_test():
+    header_block = scan_headers('Subject: hi\r\nTo: a@b.com\r\n')
+    eq_([('Subject', 'hi'), ('To', 'a@b.com')],
+        list(header_block.headers.items()))
+    eq_(26, header_block.body_start)
+
+    header_block = scan_headers('\r\nhello')
+    eq_([], list(header_block.headers.items()))
+    eq_(2, header_block.body_start)
+    eq_('hello', header_block.to_message().body)
+
+
 def tree_to_string(part):
     parts = []
     print_tree(part, parts, "")
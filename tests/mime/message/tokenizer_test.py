@@ -209,3 +209,34 @@ def tokenizer_table_driven_test():
                 tc['tokens'] + [''] * (max_len - len(tc['tokens'])),
                 tokens + [''] * (max_len - len(tokens))):
             eq_(expected_token, token)
+
+
+def tokenizer_body_lines_test():
+    # Bodies are skipped up to the next line that starts with dashes, make
+    # sure that nothing but real boundaries is taken from there.
+    mime = (
+        'Content-Type: multipart/mixed; boundary=bd\r\n'
+        '\r\n'
+        '--bd\r\n'
+        '\r\n'
+        '--bd\r\n'
+        'Content-Type: text/plain\r\n'
+        '\r\n'
+        'Content-Type: text/html\r\n'
+        '-- \r\n'
+        '--bd-x\r\n'
+        ' --bd\r\n'
+        '--bd\r\n'
+        'Content-Type: text/html\r\n'
+        '\r\n'
+        '--bd--\r\n'
+        '--bd\r\n')
+    eq_([C('multipart', 'mixed', dict(boundary='bd')),
+         B('bd', _DUMMY, _DUMMY, False),
+         B('bd', _DUMMY, _DUMMY, False),
+         C('text', 'plain', {}),
+         B('bd', _DUMMY, _DUMMY, False),
+         C('text', 'html', {}),
+         B('bd', _DUMMY, _DUMMY, True),
+         B('bd', _DUMMY, _DUMMY, False)],
+        tokenize(mime))